@@ -0,0 +1,57 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas
+from app.gui import pdf_creator
+from app.src import constants, splits_parser
+
+
+def export_category(data: pandas.DataFrame, class_id: str, category: str, event_info: list, limit: str,
+                    path: str) -> str:
+    """Creates pdf analysis of one category and saves it to ``path`` (runs in worker process)"""
+    pdf = pdf_creator.pdf_with_graph(data, limit, 'Kategorie: ' + category, [], class_id, event_info)
+    pdf.output(path, 'F')
+    return path
+
+
+def get_file_name(event_id: str, category: str) -> str:
+    """Creates pdf file name like the one offered for download in the app"""
+    return 'analysis_' + event_id + '_' + re.sub(r'[^\w-]', '_', category) + '.pdf'
+
+
+def export_event(event_id: str, output_dir: str, limit: str = 'none', workers: int = None,
+                 fetch_workers: int = constants.MAX_PARALLEL_REQUESTS) -> dict:
+    """Exports pdf analysis of every category of event ``event_id`` to ``output_dir``\n
+    Splits of all categories are loaded concurrently, pdfs are created in a pool of ``workers`` processes\n
+    :returns dictionary with exported files, skipped categories (with error) and timings or error string"""
+    start = time.perf_counter()
+    entity, event_info, categories = splits_parser.load_categories(event_id)
+    if type(entity) is str:
+        return entity
+    class_ids = list(categories.keys())
+    with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+        splits = list(pool.map(splits_parser.load_splits, class_ids))
+    loaded = time.perf_counter()
+
+    os.makedirs(output_dir, exist_ok=True)
+    exported = []
+    skipped = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for class_id, data in zip(class_ids, splits):
+            if type(data) is str:
+                skipped[categories[class_id]] = data
+                continue
+            path = os.path.join(output_dir, get_file_name(event_id, categories[class_id]))
+            futures[class_id] = pool.submit(export_category, data, class_id, categories[class_id], event_info,
+                                            limit, path)
+        for class_id, future in futures.items():
+            try:
+                exported.append(future.result())
+            except Exception as e:
+                skipped[categories[class_id]] = str(e)
+    finished = time.perf_counter()
+    return {'exported': exported, 'skipped': skipped, 'load_time': loaded - start,
+            'export_time': finished - loaded, 'total_time': finished - start}
+
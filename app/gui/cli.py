@@ -0,0 +1,235 @@
+import argparse
+import sys
+import pandas
+from app.src import api, constants, splits_parser, timings
+
+
+def format_table(data: pandas.DataFrame, seconds: bool) -> pandas.DataFrame:
+    """Formats int time and place columns of splits table to text, unless raw ``seconds`` are required"""
+    if seconds:
+        return data
+    data = data.copy()
+    for x in data.filter(regex="(Total|Split)Time.*").columns:
+        data[x] = splits_parser.format_times(data[x].to_numpy())
+    for x in data.filter(regex="(Total|Split)Place.*").columns:
+        data[x] = splits_parser.format_places(data[x].to_numpy())
+    return data
+
+
+def write_table(data: pandas.DataFrame, output_format: str, output: str):
+    """Writes table as csv or json (list of records) to ``output`` file or to stdout"""
+    if output_format == 'json':
+        text = data.to_json(orient='records', force_ascii=False, indent=1)
+    else:
+        text = data.to_csv(index=False)
+    if output == '':
+        sys.stdout.write(text + ('' if text.endswith('\n') else '\n'))
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def print_info(info: list):
+    """Prints event or runner info lines to stderr, so that they do not mix with the table"""
+    for i in info:
+        if i != '':
+            print(i, file=sys.stderr)
+
+
+def print_timings():
+    """Prints summary of all timing spans to stderr"""
+    for g in timings.summary(timings.get_spans()):
+        print('%-32s %5d x %9.4f s (max %.4f s) %10d B  cache %d/%d  %d rows'
+              % (g['name'], g['count'], g['seconds'], g['max'], g['bytes'], g['hit'], g['hit'] + g['miss'],
+                 g['rows']), file=sys.stderr)
+
+
+def run_splits(options):
+    """Loads splits of category given by ID or by name and event"""
+    class_id = options.category
+    if options.event != '':
+        event = api.get_event(options.event)
+        if type(event) is str:
+            return event
+        class_id = api.get_category_id(options.event, options.category)
+        if class_id == 'err':
+            suggestions = api.suggest_categories(options.event, options.category)
+            if suggestions:
+                print('Podobné kategorie: ' + ', '.join(suggestions), file=sys.stderr)
+            return 'kategorie ' + options.category
+    result = api.get_splits(class_id)
+    if type(result) is str:
+        return result
+    return format_table(result.splits, options.seconds)
+
+
+def run_course(options):
+    """Loads merged splits of all categories, which ran the same course as category given by ID or name,
+    or lists courses of event without category"""
+    if options.category == '':
+        return api.get_courses(options.event)
+    class_id = api.get_category_id(options.event, options.category)
+    if class_id == 'err':
+        class_id = options.category
+    result = api.get_course(options.event, class_id)
+    if type(result) is str:
+        return result
+    print('Trať: ' + result.name, file=sys.stderr)
+    return format_table(result.splits, options.seconds)
+
+
+def run_event(options):
+    """Loads categories of event"""
+    result = api.get_event(options.event)
+    if type(result) is str:
+        return result
+    print_info(result.info)
+    return result.classes.reset_index()
+
+
+def run_events(options):
+    """Loads filtered event calendar"""
+    return api.get_calendar(options.year, options.mask, options.levels, options.all_sports, options.all_events,
+                            not options.last_days)
+
+
+def run_runner(options):
+    """Loads season results of runner"""
+    result = api.get_runner(options.reg_no, options.year)
+    if type(result) is str:
+        return result
+    print_info(result.info)
+    return result.results.reset_index(drop=True)
+
+
+def run_history(options):
+    """Loads results of runner in several seasons"""
+    result = api.get_runner_history(options.reg_no, options.years)
+    if type(result) is str:
+        return result
+    print_info(result.info)
+    return result.results
+
+
+def run_club(options):
+    """Loads season results of several runners"""
+    return api.get_club(options.reg_nos, options.year)
+
+
+def run_export(options):
+    """Exports pdf analysis of all categories of event and prints a summary (returns no table)"""
+    from app.gui import batch_export
+    result = batch_export.export_event(options.event, options.output, options.limit, options.workers)
+    if type(result) is str:
+        return result
+    for category, error in result['skipped'].items():
+        print('Přeskočeno: ' + category + ' (' + error + ')')
+    count = len(result['exported'])
+    print('Exportováno %d kategorií za %.1f s (načtení %.1f s, export %.1f s), %.2f kategorií/s'
+          % (count, result['total_time'], result['load_time'], result['export_time'],
+             count / result['total_time'] if result['total_time'] else 0))
+    return None
+
+
+def run_archive(options):
+    """Archives splits of all finished events of season and prints a summary (returns no table)"""
+    from app.src import splits_archive
+    result = splits_archive.prefetch_season(options.year, options.workers)
+    if type(result) is str:
+        return result
+    print('Archivováno %d kategorií z %d závodů (%d již v archivu, %d bez mezičasů)'
+          % (result['archived'], result['events'], result['skipped'], result['empty']))
+    return None
+
+
+def add_output_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('-f', '--format', default='csv', choices=['csv', 'json'], help='výstupní formát')
+    parser.add_argument('-o', '--output', default='', help='výstupní soubor (výchozí standardní výstup)')
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='main.py', description='ORIS data analyser bez webového rozhraní '
+                                                                 '(bez argumentů se spustí aplikace)')
+    parser.add_argument('--timings', action='store_true', help='vypíše časy jednotlivých fází na chybový výstup')
+    parser.add_argument('--metrics', default='', help='soubor pro export metrik ve formátu Prometheus')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    splits = commands.add_parser('splits', help='mezičasy kategorie')
+    splits.add_argument('category', help='ID kategorie, nebo její jméno spolu s --event')
+    splits.add_argument('-e', '--event', default='', help='ID závodu')
+    splits.add_argument('-s', '--seconds', action='store_true', help='časy v sekundách místo textu M:SS')
+    add_output_arguments(splits)
+    splits.set_defaults(run=run_splits)
+
+    course = commands.add_parser('course', help='mezičasy všech kategorií na stejné trati')
+    course.add_argument('event', help='ID závodu')
+    course.add_argument('category', nargs='?', default='', help='ID nebo jméno kategorie (bez ní se vypíší tratě)')
+    course.add_argument('-s', '--seconds', action='store_true', help='časy v sekundách místo textu M:SS')
+    add_output_arguments(course)
+    course.set_defaults(run=run_course)
+
+    event = commands.add_parser('event', help='kategorie závodu')
+    event.add_argument('event', help='ID závodu')
+    add_output_arguments(event)
+    event.set_defaults(run=run_event)
+
+    events = commands.add_parser('events', help='kalendář závodů')
+    events.add_argument('-y', '--year', default='', help='sezóna (výchozí aktuální)')
+    events.add_argument('-m', '--mask', default='', help='část jména závodu')
+    events.add_argument('-l', '--levels', nargs='*', default=[], help='úrovně závodu (ID, viz aplikace)')
+    events.add_argument('--all-sports', action='store_true', help='všechny sporty, výchozí pouze OB')
+    events.add_argument('--all-events', action='store_true', help='i neoficiální akce')
+    events.add_argument('--last-days', action='store_true', help='pouze předchozích 30 dní')
+    add_output_arguments(events)
+    events.set_defaults(run=run_events)
+
+    runner = commands.add_parser('runner', help='výsledky závodníka v sezóně')
+    runner.add_argument('reg_no', help='registrační číslo (ABC1234)')
+    runner.add_argument('-y', '--year', default=constants.YEARS[0], help='sezóna')
+    add_output_arguments(runner)
+    runner.set_defaults(run=run_runner)
+
+    history = commands.add_parser('history', help='výsledky závodníka ve všech sezónách')
+    history.add_argument('reg_no', help='registrační číslo (ABC1234)')
+    history.add_argument('-y', '--years', nargs='+', default=constants.YEARS, help='sezóny (výchozí všechny)')
+    add_output_arguments(history)
+    history.set_defaults(run=run_history)
+
+    club = commands.add_parser('club', help='výsledky více závodníků v sezóně')
+    club.add_argument('reg_nos', nargs='+', help='registrační čísla')
+    club.add_argument('-y', '--year', default=constants.YEARS[0], help='sezóna')
+    add_output_arguments(club)
+    club.set_defaults(run=run_club)
+
+    export = commands.add_parser('export', help='pdf analýza všech kategorií závodu')
+    export.add_argument('event', help='ID závodu v ORISu')
+    export.add_argument('-o', '--output', default='.', help='výstupní složka')
+    export.add_argument('-l', '--limit', default='none', choices=constants.RUNNERS_LIMIT,
+                        help='max počet závodníků v grafu')
+    export.add_argument('-w', '--workers', type=int, default=None, help='počet procesů (výchozí dle CPU)')
+    export.set_defaults(run=run_export)
+
+    archive = commands.add_parser('archive', help='stažení mezičasů celé sezóny do archivu')
+    archive.add_argument('year', help='sezóna')
+    archive.add_argument('-w', '--workers', type=int, default=constants.MAX_PARALLEL_REQUESTS,
+                         help='počet souběžných dotazů')
+    archive.set_defaults(run=run_archive)
+    return parser
+
+
+def main(args: list) -> int:
+    """Command line interface: *python main.py COMMAND ...*, tables are written as csv or json\n
+    :returns exit code"""
+    options = create_parser().parse_args(args)
+    result = options.run(options)
+    if options.timings:
+        print_timings()
+    if options.metrics != '':
+        with open(options.metrics, 'w', encoding='utf-8') as f:
+            f.write(timings.to_prometheus())
+    if type(result) is str:
+        print('Chyba: [ ' + result + ' ] je neplatné', file=sys.stderr)
+        return 1
+    if result is not None:
+        write_table(result, options.format, options.output)
+    return 0
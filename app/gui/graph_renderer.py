@@ -0,0 +1,86 @@
+import hashlib
+import io
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import fpdf
+import pandas
+import plotly.graph_objects as go
+from PIL import Image
+from app.src import loader
+from app.src import constants, timings
+
+_executor = None
+_executor_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def start() -> ThreadPoolExecutor:
+    """Starts long-lived rendering service (only once) and warms up kaleido by rendering an empty figure
+    in the background, so that the first export does not pay its cold start"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='graph-renderer')
+            _executor.submit(render_png, go.Figure())
+        return _executor
+
+
+@timings.timed('render_png')
+def render_png(graph: go.Figure) -> bytes:
+    """Renders figure to png by kaleido"""
+    return graph.to_image(format='png')
+
+
+def png_to_image_info(png: bytes) -> dict:
+    """Decodes png image and converts it in fpdf image description (RGB, Flate encoded rows),
+    fpdf itself can read images only from files"""
+    image = Image.open(io.BytesIO(png)).convert('RGB')
+    width, height = image.size
+    raw = image.tobytes()
+    stride = 3 * width
+    rows = b''.join(b'\x00' + raw[i * stride:(i + 1) * stride] for i in range(height))
+    return {'w': width, 'h': height, 'cs': 'DeviceRGB', 'bpc': 8, 'f': 'FlateDecode',
+            'dp': '/Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns ' + str(width), 'data': zlib.compress(rows)}
+
+
+def render_graph(data: pandas.DataFrame, show_relative: bool, limit: str, filtered: list) -> dict:
+    """Creates absolute/relative graph and renders it to fpdf image description"""
+    graph = loader.load_split_graphs(data, show_relative, limit, list(filtered))
+    return png_to_image_info(render_png(graph))
+
+
+def get_cache_key(class_id: str, limit: str, filtered: list) -> str:
+    return hashlib.sha1(repr((class_id, limit, sorted(filtered))).encode()).hexdigest()
+
+
+@timings.timed('get_graph_images')
+def get_graph_images(data: pandas.DataFrame, class_id: str, limit: str, filtered: list) -> tuple:
+    """Renders absolute and relative graph in parallel, images are cached by (``class_id``, ``limit``, ``filtered``)\n
+    :returns pair of fpdf image descriptions (absolute, relative)"""
+    key = get_cache_key(class_id, limit, filtered)
+    if class_id != '':
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key]
+    executor = start()
+    absolute = executor.submit(render_graph, data, False, limit, filtered)
+    relative = executor.submit(render_graph, data, True, limit, filtered)
+    images = absolute.result(), relative.result()
+    if class_id != '':
+        with _cache_lock:
+            _cache[key] = images
+            while len(_cache) > constants.GRAPH_IMAGE_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return images
+
+
+def add_image(pdf: fpdf.FPDF, name: str, info: dict, x: float, y: float, w: float):
+    """Places image from memory described by ``info`` into ``pdf`` (a copy is registered, because fpdf
+    drops image data after the document is written)"""
+    if name not in pdf.images:
+        pdf.images[name] = dict(info, i=len(pdf.images) + 1)
+    pdf.image(name, x, y, w)
@@ -1,11 +1,11 @@
 import datetime
-import tempfile
 import fpdf
+import numpy
 import pandas
 from fpdf import FPDF
-from app.gui import streamlitapp as sapp
+from app.gui import graph_renderer
 from app.src import loader
-from app.src import constants
+from app.src import constants, timings
 
 
 def cut_graph_limit(limit: str, filtered: list) -> str:
@@ -19,55 +19,77 @@ def cut_graph_limit(limit: str, filtered: list) -> str:
     return limit
 
 
-def get_relative_data(data: pandas.DataFrame, show_relative: bool) -> (pandas.DataFrame, str):
+def get_relative_data(data: pandas.DataFrame, show_relative: bool, class_id: str = '') -> (pandas.DataFrame, str):
     """Reduces dataframe to splits_only or total_time_only and with it return appropriate header"""
     if show_relative:
-        return loader.crop_dataframe(data, True), 'Čas a umístění na mezičasech'
-    return loader.crop_dataframe(data, False), 'Celkový čas a umístění'
+        return loader.crop_dataframe(data, True, class_id), 'Čas a umístění na mezičasech'
+    return loader.crop_dataframe(data, False, class_id), 'Celkový čas a umístění'
 
 
-def add_table(pdf: fpdf.FPDF, data: pandas.DataFrame, show_relative: bool, to_color: list):
+@timings.timed('add_table')
+def add_table(pdf: fpdf.FPDF, data: pandas.DataFrame, show_relative: bool, to_color: list, class_id: str = ''):
     """Creates a table with times and standings on a new page (or more for many runners), displays all of them
     Table will contain absolute times if show_relative=False or split times if show_relative=True
-    When course has more than 15+finish controls, then cell will be narrower to fit on one page"""
-    pdf.add_page(orientation='L')
-    df, label = get_relative_data(data, show_relative)
-    pdf.set_font('DejaVu', 'B', 10)
-    pdf.write(5, label)
-    pdf.ln(7)
-    front, times, positions = loader.shrink_table(df)
-    coef = 1
-    cell_cnt = len(times.columns.to_list())
-    if cell_cnt > 16:
-        coef = 16 / cell_cnt
+    When course has more than ``constants.TABLE_COLUMNS`` controls, columns are split in more tables
+    (each on its own pages), header row is repeated on every page\n
+    Table parts are memoized for ``class_id`` (see ``loader.get_view``)"""
+    df, label = get_relative_data(data, show_relative, class_id)
+    front, times, positions = loader.shrink_table(df, class_id, show_relative)
+    names = df.index.to_numpy().astype(str)
+    is_colored = numpy.isin(front['RegNo'].to_numpy().astype(str), to_color)
+    front_cols = front.columns.to_list()
+    front_values = front.to_numpy().astype(str)
+    time_cols = times.columns.to_list()
+    time_values = times.to_numpy().astype(str)
+    position_values = positions.to_numpy().astype(str)
+    chunks = range(0, max(len(time_cols), 1), constants.TABLE_COLUMNS)
+    for start in chunks:
+        end = start + constants.TABLE_COLUMNS
+        header = label
+        if len(chunks) > 1:
+            header = label + ' (%s - %s)' % (time_cols[start], time_cols[min(end, len(time_cols)) - 1])
+        add_table_part(pdf, header, names, is_colored, front_cols, front_values, time_cols[start:end],
+                       time_values[:, start:end], position_values[:, start:end])
+    return pdf
+
+
+def add_table_header(pdf: fpdf.FPDF, front_cols: list, time_cols: list):
+    """Writes header row of table"""
     pdf.set_font('DejaVu', 'B', constants.FONT_SIZE)
     pdf.cell(constants.INDEX_CELL_WIDTH, constants.HEADER_CELL_HEIGHT, '', 1, 0, 'C')
-    for x in front.columns.to_list():
+    for x in front_cols:
         pdf.cell(constants.FRONT_CELL_WIDTH, constants.HEADER_CELL_HEIGHT, x, 1, 0, 'C')
-    for x in times.columns.to_list():
-        pdf.cell(constants.CELL_WIDTH * coef, constants.HEADER_CELL_HEIGHT, x, 1, 0, 'C')
+    for x in time_cols:
+        pdf.cell(constants.CELL_WIDTH, constants.HEADER_CELL_HEIGHT, x, 1, 0, 'C')
     pdf.ln(constants.HEADER_CELL_HEIGHT)
-    for i in range(0, len(df)):
+
+
+def add_table_part(pdf: fpdf.FPDF, label: str, names, is_colored, front_cols: list, front_values,
+                   time_cols: list, time_values, position_values):
+    """Writes one table (all runners, some time columns) row by row starting on a new page,
+    before a row would overflow the page, a new page with header row is added"""
+    pdf.add_page(orientation='L')
+    pdf.set_font('DejaVu', 'B', 10)
+    pdf.write(5, label)
+    pdf.ln(7)
+    add_table_header(pdf, front_cols, time_cols)
+    for i in range(len(names)):
+        if pdf.get_y() + constants.CELL_HEIGHT > pdf.page_break_trigger:
+            pdf.add_page(orientation='L')
+            add_table_header(pdf, front_cols, time_cols)
+        colored = bool(is_colored[i])
         pdf.set_font('DejaVu', 'CB', constants.FONT_SIZE)
-        name = df.index.to_list()[i]
-        if str(front.loc[name, 'RegNo']) in to_color:
-            is_colored = True
-        else:
-            is_colored = False
-        pdf.cell(constants.INDEX_CELL_WIDTH, constants.CELL_HEIGHT, '%s' % name, 1, 0, 'C', is_colored)
+        pdf.cell(constants.INDEX_CELL_WIDTH, constants.CELL_HEIGHT, names[i], 1, 0, 'C', colored)
         pdf.set_font('DejaVu', '', constants.FONT_SIZE)
-        for x in front.columns.to_list():
-            pdf.cell(constants.FRONT_CELL_WIDTH, constants.CELL_HEIGHT, '%s' % (str(front.loc[name, x])), 1, 0, 'C', is_colored)
-        pdf.set_font('DejaVu', '', constants.FONT_SIZE * coef)
-        for x in times.columns.to_list():
-            pdf.cell(constants.CELL_WIDTH * coef, constants.CELL_HEIGHT / 2, '%s' % (str(times.loc[name, x])), 1, 0, 'C', is_colored)
+        for x in front_values[i]:
+            pdf.cell(constants.FRONT_CELL_WIDTH, constants.CELL_HEIGHT, x, 1, 0, 'C', colored)
+        for x in time_values[i]:
+            pdf.cell(constants.CELL_WIDTH, constants.CELL_HEIGHT / 2, x, 1, 0, 'C', colored)
         pdf.ln(constants.CELL_HEIGHT / 2)
         pdf.cell(constants.LINE_OFFSET)
-        for x in positions.columns.to_list():
-            text = str(positions.loc[name, x])
-            pdf.cell(constants.CELL_WIDTH * coef, constants.CELL_HEIGHT / 2, '%s' % text, 1, 0, 'C', is_colored)
+        for x in position_values[i]:
+            pdf.cell(constants.CELL_WIDTH, constants.CELL_HEIGHT / 2, x, 1, 0, 'C', colored)
         pdf.ln(constants.CELL_HEIGHT / 2)
-    return pdf
 
 
 def get_rows_to_color(filtered: list, limit: str, all_runners: list):
@@ -82,10 +104,14 @@ def get_rows_to_color(filtered: list, limit: str, all_runners: list):
     return all_runners[:lim]
 
 
-def pdf_with_graph(data: pandas.DataFrame, limit: str, category_text: str, filtered: list) -> fpdf.FPDF:
+@timings.timed('pdf_with_graph')
+def pdf_with_graph(data: pandas.DataFrame, limit: str, category_text: str, filtered: list,
+                   class_id: str = '', event_info: list = None) -> fpdf.FPDF:
     """Creates a pdf file for given dataframe:
-    First page contains some information, then there are two similar sections, each with graph and table
-    One section displays total time, the other relative split time"""
+    First page contains some information (``event_info`` lines and ``category_text``),
+    then there are two similar sections, each with graph and table
+    One section displays total time, the other relative split time\n
+    Graph images are cached for given ``class_id`` (see ``graph_renderer.get_graph_images``)"""
     pdf = FPDF()
     pdf.add_page(orientation='P')
     pdf.image('./app/fonts/Orienteering_symbol.png', 60, 20, 100)
@@ -101,7 +127,7 @@ def pdf_with_graph(data: pandas.DataFrame, limit: str, category_text: str, filte
     pdf.set_font('DejaVu', '', 14)
 
     if category_text != '':
-        for x in sapp.event_info:
+        for x in event_info or []:
             pdf.write(5, x)
             pdf.ln(5)
             pdf.ln(5)
@@ -112,22 +138,17 @@ def pdf_with_graph(data: pandas.DataFrame, limit: str, category_text: str, filte
     timestamp_str = timestamp.strftime("%d.%m.%Y %H:%M:%S")
     pdf.write(5, 'Exportováno: ' + timestamp_str)
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-        pdf.add_page(orientation='L')
-        limit = cut_graph_limit(limit, filtered)
-        graph = loader.load_split_graphs(data, False, limit, filtered)
-        graph.write_image(tmpfile.name, format="png")
-        pdf.image(tmpfile.name, 10, 10, constants.GRAPH_SCALE)
+    limit = cut_graph_limit(limit, filtered)
+    absolute, relative = graph_renderer.get_graph_images(data, class_id, limit, filtered)
+    pdf.add_page(orientation='L')
+    graph_renderer.add_image(pdf, 'absolute.png', absolute, 10, 10, constants.GRAPH_SCALE)
 
     all_runners = data['RegNo'].to_list()
     to_color = get_rows_to_color(filtered, limit, all_runners)
-    pdf = add_table(pdf, data, False, to_color)
+    pdf = add_table(pdf, data, False, to_color, class_id)
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-        pdf.add_page(orientation='L')
-        graph = loader.load_split_graphs(data, True, limit, filtered)
-        graph.write_image(tmpfile.name, format="png")
-        pdf.image(tmpfile.name, 10, 10, constants.GRAPH_SCALE)
+    pdf.add_page(orientation='L')
+    graph_renderer.add_image(pdf, 'relative.png', relative, 10, 10, constants.GRAPH_SCALE)
 
-    pdf = add_table(pdf, data, True, to_color)
+    pdf = add_table(pdf, data, True, to_color, class_id)
     return pdf
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas
+from app.gui import pdf_creator
+from app.src import constants, loader
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Pool of ``constants.EXPORT_WORKERS`` export workers shared by all sessions (started only once)"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=constants.EXPORT_WORKERS, thread_name_prefix='pdf-export')
+        return _executor
+
+
+def get_data_version(data: pandas.DataFrame) -> str:
+    """Hash of table content, stable across processes (memoized for loaded table, see ``loader.get_view``)"""
+    values = pandas.util.hash_pandas_object(data, index=True).to_numpy()
+    return hashlib.sha1(values.tobytes() + ','.join(data.columns).encode()).hexdigest()
+
+
+def get_key(data: pandas.DataFrame, class_id: str, limit: str, filtered: list, category_text: str) -> str:
+    """Key of exported file: (``class_id``, ``limit``, ``filtered`` runners, data version and ``category_text``)"""
+    version = loader.get_view(data, class_id, 'version', get_data_version)
+    return hashlib.sha1(repr((class_id, limit, sorted(filtered), version, category_text)).encode()).hexdigest()
+
+
+def get_file_path(key: str) -> str:
+    return os.path.join(constants.EXPORT_PATH, key + '.pdf')
+
+
+def submit(data: pandas.DataFrame, limit: str, category_text: str, filtered: list, class_id: str,
+           event_info: list) -> dict:
+    """Starts pdf export (see ``pdf_creator.pdf_with_graph``) in background, unless the same view is exported
+    already or its file exists (then job is finished at once)\n
+    :returns job dictionary: file ``path``, ``error`` string and ``finished`` flag"""
+    key = get_key(data, class_id, limit, filtered, category_text)
+    path = get_file_path(key)
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and (not job['finished'] or job['error'] == '' and os.path.exists(path)):
+            return job
+        job = {'key': key, 'path': path, 'error': '', 'finished': False, 'started': time.time()}
+        if os.path.exists(path):
+            os.utime(path)
+            job['finished'] = True
+            return job
+        _jobs[key] = job
+    get_executor().submit(run, job, data, limit, category_text, list(filtered), class_id, list(event_info))
+    return job
+
+
+def run(job: dict, data: pandas.DataFrame, limit: str, category_text: str, filtered: list, class_id: str,
+        event_info: list):
+    """Creates pdf and writes it to job file (atomically, through temporary file), old files are deleted"""
+    try:
+        os.makedirs(constants.EXPORT_PATH, exist_ok=True)
+        pdf = pdf_creator.pdf_with_graph(data, limit, category_text, filtered, class_id, event_info)
+        pdf.output(job['path'] + '.tmp', 'F')
+        os.replace(job['path'] + '.tmp', job['path'])
+        drop_old_files()
+    except Exception as e:
+        job['error'] = str(e) or type(e).__name__
+    finally:
+        with _lock:
+            job['finished'] = True
+            if job['error'] == '':
+                del _jobs[job['key']]
+
+
+def drop_old_files():
+    """Deletes least recently exported (or requested) files over ``constants.EXPORT_FILES_KEPT``"""
+    files = [f for f in os.scandir(constants.EXPORT_PATH) if f.name.endswith('.pdf')]
+    files.sort(key=lambda f: f.stat().st_mtime)
+    for f in files[:max(0, len(files) - constants.EXPORT_FILES_KEPT)]:
+        try:
+            os.remove(f.path)
+        except OSError:
+            pass
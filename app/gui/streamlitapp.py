@@ -1,30 +1,24 @@
-import base64
+import os
+import time
 import pandas
 from datetime import date
 import streamlit as st
 
-from app.gui import pdf_creator
+from app.gui import graph_renderer
+from app.gui import pdf_export
 from app.src import loader
-from app.src import constants
+from app.src import constants, timings
 
 event_id = ''
 event_info = []
 event_categories = dict()
 category_runners = []
-runner_info = []
-
-
-# inspired by Streamlit forum
-def create_download_link(val, filename):
-    """Simple function, that creates link for downloading file
-    Not my work, borrowed from StackOverflow"""
-    b64 = base64.b64encode(val)
-    return f'<a href="data:application/octet-stream;base64,{b64.decode()}" download="{filename}.pdf">Stáhnout</a>'
 
 
 def load_page_splits(entity: pandas.DataFrame, category: str):
     """Creates page layout for a DataFrame ``entity`` with information about event and ``category`` at the top
-    Layout consists of graph with control elements and two DataFrames, with total time and with split time"""
+    Layout consists of graph with control elements and two DataFrames, with total time and with split time\n
+    Category may be compared with all categories of the same course (see ``loader.load_course``)"""
     category_text = category
     if category in event_categories:
         for i in event_info:
@@ -32,11 +26,25 @@ def load_page_splits(entity: pandas.DataFrame, category: str):
                 st.write(i)
         category_text = event_categories[category]
         st.markdown('Kategorie: __' + event_categories[category] + '__')
+    key = category
+    runners_options = category_runners
+    course_splits = None
+    if category in event_categories and st.checkbox("Porovnat celou trať", value=False,
+                                                    help="Přidá kategorie, které běžely stejnou trať"):
+        course = loader.load_course(event_id, category)
+        if type(course) is str:
+            show_error(course)
+        else:
+            entity = course_splits = course.splits
+            key = 'course:' + ','.join(course.class_ids)
+            runners_options = course.runners
+            category_text = course.name
+            st.markdown('Trať: __' + course.name + '__')
     limit = st.select_slider(
         'Max počet závodníků', options=constants.RUNNERS_LIMIT
     )
     runners = st.multiselect(
-        "Výběr závodníků k porovnání s vítězem", options=category_runners
+        "Výběr závodníků k porovnání s vítězem", options=runners_options
     )
     st.markdown("__Zobrazení grafu__")
     show_relative = st.checkbox("Relativní porovnání dle ztráty", value=False, help="Výchozí zobrazení dle času od startu")
@@ -44,19 +52,57 @@ def load_page_splits(entity: pandas.DataFrame, category: str):
     filtered = loader.filter_runner_id(runners)
     if filtered:
         limit = 'none'
-    st.plotly_chart(loader.load_split_graphs(entity, show_relative, limit, filtered), use_container_width=True)
+    st.plotly_chart(get_split_graph(entity, key, show_relative, limit, filtered), use_container_width=True)
     st.markdown('__Celkové časy a umístění__')
-    st.dataframe(loader.crop_and_style(entity, limit, filtered, False))
+    st.dataframe(loader.crop_and_style(entity, limit, filtered, False, key))
     st.markdown('__Časy a umístění podle mezičasů__')
-    st.dataframe(loader.crop_and_style(entity, limit, filtered, True))
-    # export_as_pdf = st.button("Exportovat", help="Vygeneruje se pdf, které je poté nutné stáhnout kliknutím na odkaz")
-    # if export_as_pdf:
-    #     pdf = pdf_creator.pdf_with_graph(entity, limit, 'Kategorie: ' + category_text, filtered)
-    #     html = create_download_link(pdf.output(dest="S").encode("latin-1"), "analysis_" + event_id + "_" + category_text)
-    #     st.markdown(html, unsafe_allow_html=True)
+    st.dataframe(loader.crop_and_style(entity, limit, filtered, True, key))
+    st.markdown('__Ztráty na nejlepší úseky a odhad chyb__')
+    st.dataframe(loader.load_mistakes_table(key, limit, filtered, course_splits))
+    export_splits(entity, key, limit, category_text, filtered)
+
+
+def export_splits(entity: pandas.DataFrame, key: str, limit: str, category_text: str, filtered: list):
+    """Export button starts pdf export in background (see ``pdf_export.submit``), job of session is kept
+    in session state and page waits for it, finished file of shown view is offered for download"""
+    title = ('Trať: ' if key.startswith('course:') else 'Kategorie: ') + category_text
+    if st.button("Exportovat", help="Vygeneruje se pdf, které je poté možné stáhnout tlačítkem"):
+        st.session_state['export_job'] = pdf_export.submit(entity, limit, title, filtered, key, event_info)
+    job = st.session_state.get('export_job')
+    if job is None or job['key'] != pdf_export.get_key(entity, key, limit, filtered, title):
+        return
+    status = st.empty()
+    while not job['finished']:
+        status.info('Pdf se vytváří (%d s)' % (time.time() - job['started']))
+        time.sleep(constants.RUNNER_POLL_INTERVAL)
+    status.empty()
+    if job['error'] != '':
+        st.error('Export se nezdařil: ' + job['error'])
+        return
+    if not os.path.exists(job['path']):
+        # file was replaced by newer exports
+        del st.session_state['export_job']
+        return
+    with open(job['path'], 'rb') as file:
+        st.download_button("Stáhnout", file, file_name='analysis_' + event_id + '_' + category_text + '.pdf',
+                           mime='application/pdf')
+
+
+def get_split_graph(entity: pandas.DataFrame, category: str, show_relative: bool, limit: str, filtered: list):
+    """Absolute/relative graph of ``category``, figures with all runners are created once per category and kept
+    in session state, widget changes only choose shown and highlighted runners (limited view gets a figure
+    with just the shown traces, see ``graphs.update_plotly_splits_graph``)"""
+    state = st.session_state.get('split_graphs')
+    if state is None or state[0] != category or state[1] is not entity:
+        state = (category, entity, {})
+        st.session_state['split_graphs'] = state
+    figures = state[2]
+    if show_relative not in figures:
+        figures[show_relative] = loader.create_split_graph(entity, show_relative)
+    return loader.update_split_graph(figures[show_relative], entity, limit, filtered)
 
 
-def splits_handle_error(error: str, mask: str):
+def splits_handle_error(error: str, mask: str, category: str = '', event: str = ''):
     if error == 'not found':
         st.error("Žádné výsledky pro filtr { " + mask + " } nenalezeny")
         st.markdown("_Možná jsou podmínky příliš přísné_")
@@ -66,6 +112,9 @@ def splits_handle_error(error: str, mask: str):
         show_error(error)
         if 'kategorie' in error:
             st.markdown("_Možná je v názvu kategorie překlep_")
+            suggestions = loader.suggest_categories(category, event) if event != '' else []
+            if suggestions:
+                st.markdown("Podobné kategorie: __" + ', '.join(suggestions) + "__")
             if event_categories:
                 st.write("Platné kategorie:")
                 vals = [*event_categories.values()]
@@ -81,7 +130,17 @@ def splits_layout():
     """Creates sidebar layout for split analysis"""
     st.sidebar.header("Zadejte ID závodu a kategorii...")
     event = st.sidebar.text_input("ID závodu:", help="Po zadání ID se zobrazí kategorie")
-    category = st.sidebar.text_input("Jméno kategorie:")
+    category_names = []
+    if event != '':
+        event_name = loader.get_event_name(event)
+        if event_name != '':
+            st.sidebar.caption(event_name)
+        category_names = loader.get_category_names(event)
+    if category_names:
+        category = st.sidebar.selectbox("Jméno kategorie:", options=[''] + category_names,
+                                        help="Kategorii lze vyhledat psaním jejího jména")
+    else:
+        category = st.sidebar.text_input("Jméno kategorie:")
     st.sidebar.header("...nebo vyberte sezónu")
     event_year = st.sidebar.selectbox(
         "Sezóna:", options=constants.YEARS
@@ -105,10 +164,48 @@ def splits_layout():
     return category, event, event_year, mask, levels, all_sports, all_events, whole_season
 
 
-def load_page_runner(entity: pandas.DataFrame):
-    """Creates page layout for ``entity`` with event results and then creates graphs for 3 event levels"""
-    for i in runner_info:
-        st.markdown(i)
+def load_page_runner(reg_no: str, year: str):
+    """Creates page layout for runner's results, that are shown while they are loaded:
+    table with event results and graphs for 3 event levels grow as events are processed,
+    progress bar shows count of processed events (reloaded page continues with already loaded events)"""
+    job = loader.start_runner(reg_no, year)
+    info = st.empty()
+    progress = st.empty()
+    table = st.empty()
+    graphs = [st.empty() for _ in range(0, 3)]
+    shown = -1
+    while True:
+        finished = job['finished']
+        if job['error'] != '':
+            progress.empty()
+            runner_handle_error(job['error'], reg_no, year)
+            return
+        entity, done = loader.get_runner_results(job)
+        if done != shown:
+            shown = done
+            info.markdown('  \n'.join(job['info']))
+            table.table(entity)
+            for x in range(0, 3):
+                graph = loader.load_runner_graphs(entity, x)
+                if type(graph) != str:
+                    graphs[x].plotly_chart(graph, use_container_width=True)
+        if finished:
+            progress.empty()
+            return
+        if job['total'] > 0:
+            progress.progress(done / job['total'], text='Načteno %d z %d závodů' % (done, job['total']))
+        time.sleep(constants.RUNNER_POLL_INTERVAL)
+
+
+def load_page_history(reg_no: str):
+    """Creates page layout for runner's results in all seasons: table with event results of every season
+    and graphs for 3 event levels over all seasons (finished seasons are stored, so repeated view is fast)"""
+    with st.spinner('Načítání sezón...'):
+        entity, runner_info = loader.load_runner_history(reg_no)
+    if type(entity) is str:
+        runner_handle_error(entity, reg_no, constants.YEARS_ALL)
+        return
+    st.markdown('  \n'.join(runner_info))
     st.table(entity)
     for x in range(0, 3):
         graph = loader.load_runner_graphs(entity, x)
@@ -116,13 +213,52 @@ def load_page_runner(entity: pandas.DataFrame):
             st.plotly_chart(graph, use_container_width=True)
 
 
+def runner_handle_error(error: str, reg_no: str, year: str):
+    if error == constants.ENTRIES_UNAVAILABLE:
+        st.error("Chyba: ORIS nevrátil závody závodníka [ " + reg_no + " ], zkuste to prosím později")
+    elif 'error' in error:
+        st.error("Chyba: žádné závody pro závodníka [ " + reg_no + " ] v sezóně [ " + year + " ]")
+    else:
+        show_error(error)
+
+
+def set_event(event):
+    """Keeps ID, info and categories of loaded ``event`` (EventResult or error string) for page layout"""
+    global event_id, event_info, event_categories
+    if type(event) is str:
+        event_info, event_categories = [], dict()
+    else:
+        event_id, event_info, event_categories = event.event_id, event.info, event.categories
+
+
 def show_error(error: str):
     st.error("Chyba: [ " + error + " ] je neplatné")
 
 
+def show_diagnostics(since: float):
+    """Shows timing spans of current page run (started at ``since``) in sidebar, with export of all metrics"""
+    spans = timings.summary(timings.get_spans(since))
+    if spans:
+        table = pandas.DataFrame(spans).set_index('name').round({'seconds': 4, 'max': 4})
+        table.columns = ['Počet', 'Čas [s]', 'Max [s]', 'Bajty', 'Cache hit', 'Cache miss', 'Řádky']
+        st.sidebar.dataframe(table)
+    else:
+        st.sidebar.write("Žádná měření (výsledky byly v paměti)")
+    stats = loader.get_prefetch_stats()
+    st.sidebar.write('Předběžné načítání: %d závodů, %d kategorií (%d bez mezičasů), první návštěvy z mezipaměti '
+                     '%d, bez ní %d' % (stats['events'], stats['classes'], stats['failed'], stats['hits'],
+                                        stats['misses']))
+    st.sidebar.download_button("Export metrik (Prometheus)", timings.to_prometheus(), file_name='metrics.txt',
+                               mime='text/plain')
+
+
 def main():
+    global category_runners
+    started = time.time()
     st.set_page_config(page_title='ORIS data analyser', layout='wide', initial_sidebar_state='auto')
     st.title('ORIS data analyser')
+    graph_renderer.start()
+    loader.start_prefetch()
 
     st.sidebar.title("Vyberte režim analýzy")
     mode = st.sidebar.selectbox(
@@ -132,45 +268,53 @@ def main():
     if mode == 'Analýza výsledků':
         category, event, event_year, mask, levels, all_sports, all_events, whole_season = splits_layout()
 
+        loaded = None
         if event != '' and category != '':
-            ctg = loader.get_category_id_from_name(category, event)
-            if 'event' in ctg:
-                show_error(category)
-            if ctg != 'err':
-                category = ctg
-        load_mode, entity = loader.load_splits(category, event, event_year, mask, levels, all_sports, all_events, whole_season)
+            loaded = loader.load_event(event)
+            set_event(loaded)
+            if type(loaded) is not str:
+                ctg = loader.get_category_id_from_name(category, event)
+                if ctg != 'err':
+                    category = ctg
+        if type(loaded) is str:
+            # invalid event, its error is shown instead of looking up category name as ID
+            load_mode, entity = constants.MODE_CATEGORIES, loaded
+        else:
+            load_mode, entity = loader.load_splits(category, event, event_year, mask, levels, all_sports, all_events, whole_season)
         if type(entity) is str:
-            splits_handle_error(entity, mask)
+            splits_handle_error(entity, mask, category, event)
         else:
             if load_mode == constants.MODE_SPLITS:
-                load_page_splits(entity, category)
+                category_runners = entity.runners
+                load_page_splits(entity.splits, category)
             else:
                 if load_mode == constants.MODE_CATEGORIES:
+                    set_event(entity)
                     for i in event_info:
                         if i != '':
                             st.write(i)
                     st.info('Vyberte kategorii')
+                    entity = entity.classes
                 else:
                     st.info('Vyberte ID závodu')
                 st.table(entity)
     else:
         st.sidebar.header("Vyberte rok a zadejte registrační číslo")
         years = st.sidebar.selectbox(
-            "Sezóna", options=constants.YEARS
+            "Sezóna", options=constants.YEARS + [constants.YEARS_ALL]
         )
         reg_no = st.sidebar.text_input("Registrační číslo:", help="Formát ABC1234, kde ABC je zkratka klubu")
         if reg_no == '':
             st.info("Zadejte registrační číslo")
             st.markdown("_Pozn.: Načítání stránky bude trvat delší dobu (záleží na počtu závodů, v průměru 1s na závod)_")
+        elif years == constants.YEARS_ALL:
+            load_page_history(reg_no)
         else:
-            entity = loader.load_runner(reg_no, years)
-            if type(entity) is str:
-                if 'error' in entity:
-                    st.error("Chyba: žádné závody pro závodníka [ " + reg_no + " ] v sezóně [ " + years + " ]")
-                else:
-                    show_error(entity)
-            else:
-                load_page_runner(entity)
+            load_page_runner(reg_no, years)
+
+    st.sidebar.markdown("""---""")
+    if st.sidebar.checkbox("Diagnostika", value=False, help="Časy načítání a zpracování dat"):
+        show_diagnostics(started)
 
     st.markdown("---")
     st.markdown("_Autor: Ondřej Měšťan (semetrální práce z předmětu BI-PYT na ČVUT FIT)_")
@@ -0,0 +1,77 @@
+import functools
+import re
+from collections import namedtuple
+import numpy as np
+import pandas
+from app.src import constants, splits_parser
+
+SplitAnalysis = namedtuple('SplitAnalysis', ['names', 'reg_nos', 'legs', 'splits', 'best', 'loss', 'ranks',
+                                             'ratio', 'median_ratio', 'mistakes'])
+
+
+def get_split_matrix(splits: pandas.DataFrame):
+    """Extracts runners x legs matrix of split times in seconds (float, NaN for sentinels)\n
+    :returns matrix and list of leg names (K1, K2, ..., F)"""
+    data = splits.filter(regex="SplitTime.*")
+    legs = [re.sub('K999', 'F', re.sub('SplitTime', 'K', x)) for x in data.columns]
+    matrix = data.to_numpy(dtype=np.float64)
+    matrix[matrix < 0] = np.nan
+    return matrix, legs
+
+
+def rank_columns(matrix: np.ndarray) -> np.ndarray:
+    """Ranks values of every column of ``matrix`` at once (ties get the same rank), NaN values get rank 0"""
+    rows, cols = matrix.shape
+    if rows == 0:
+        return np.zeros(matrix.shape, dtype=np.int16)
+    valid = ~np.isnan(matrix)
+    span = np.nanmax(matrix) + 2 if valid.any() else 2
+    shifted = np.where(valid, matrix, span - 1) + np.arange(cols) * span
+    ordered = np.sort(shifted, axis=None)
+    ranks = np.searchsorted(ordered, shifted, side='left') - np.arange(cols) * rows + 1
+    return np.where(valid, ranks, 0).astype(np.int16)
+
+
+def analyse_splits(splits: pandas.DataFrame) -> SplitAnalysis:
+    """Computes whole-matrix split analytics for ``splits`` table:
+    best time of each leg, loss to the best leg, leg ranks, pace ratio to the best leg,
+    runner's median pace ratio and estimated mistake time on every leg\n
+    Leg is considered a mistake, when the runner's ratio exceeds the runner's median ratio by
+    ``constants.ANALYSIS_MISTAKE_THRESHOLD``, mistake is the time over the expected (median paced) time"""
+    matrix, legs = get_split_matrix(splits)
+    valid = ~np.isnan(matrix)
+    best = np.full(matrix.shape[1], np.nan)
+    has_time = valid.any(axis=0)
+    best[has_time] = np.nanmin(matrix[:, has_time], axis=0)
+    loss = matrix - best
+    ratio = matrix / best
+    median_ratio = np.full(matrix.shape[0], np.nan)
+    has_ratio = (valid & has_time).any(axis=1)
+    median_ratio[has_ratio] = np.nanmedian(ratio[has_ratio], axis=1)
+    expected = best * median_ratio[:, None]
+    over = matrix - expected
+    mistakes = np.where(ratio > median_ratio[:, None] * (1 + constants.ANALYSIS_MISTAKE_THRESHOLD), over, 0)
+    mistakes[~valid] = np.nan
+    return SplitAnalysis(splits['ResName'].to_numpy(), splits['RegNo'].to_numpy(), legs, matrix, best, loss,
+                         rank_columns(matrix), ratio, median_ratio, mistakes)
+
+
+@functools.lru_cache(maxsize=constants.ANALYSIS_CACHE_SIZE)
+def load_analysis(class_id: str):
+    """Loads splits of class ``class_id`` and analyses them, results are memoized per class\n
+    :returns SplitAnalysis or error string"""
+    splits = splits_parser.load_splits(class_id)
+    if type(splits) is str:
+        return splits
+    return analyse_splits(splits)
+
+
+def get_mistakes_summary(analysis: SplitAnalysis) -> pandas.DataFrame:
+    """Summarises runners' total loss to best legs and estimated mistake time in seconds"""
+    return pandas.DataFrame({'RegNo': analysis.reg_nos,
+                             'BestLegs': (analysis.ranks == 1).sum(axis=1),
+                             'MedianRatio': np.round(analysis.median_ratio, 3),
+                             'Loss': np.nansum(analysis.loss, axis=1).astype(np.int32),
+                             'Mistakes': np.nansum(analysis.mistakes, axis=1).astype(np.int32),
+                             'MistakeLegs': (np.nan_to_num(analysis.mistakes) > 0).sum(axis=1)},
+                            index=analysis.names)
@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+import pandas
+from app.src import calendar_store, constants, course_parser, metadata_store, runner_history, runner_parser, splits_parser
+
+
+@dataclass
+class SplitsResult:
+    """Splits of one class: ``splits`` table (times in int seconds) and 'RegNo: Name' of ``runners`` behind the winner"""
+    class_id: str
+    splits: pandas.DataFrame
+    runners: list = field(default_factory=list)
+
+
+@dataclass
+class CourseResult:
+    """Merged ``splits`` of all classes (``class_ids``), which ran the same course, ``name`` lists their names"""
+    event_id: str
+    name: str
+    class_ids: list
+    splits: pandas.DataFrame
+    runners: list = field(default_factory=list)
+
+
+@dataclass
+class EventResult:
+    """Event ``info`` lines, ``categories`` (class ID -> name) and table of ``classes``"""
+    event_id: str
+    info: list
+    categories: dict
+    classes: pandas.DataFrame
+
+
+@dataclass
+class RunnerResult:
+    """Season ``results`` of one runner with ``info`` lines"""
+    reg_no: str
+    year: str
+    info: list
+    results: pandas.DataFrame
+
+
+def get_splits(class_id: str):
+    """Loads splits of class ``class_id``\n
+    :returns SplitsResult or error string"""
+    splits = splits_parser.load_splits(class_id)
+    if type(splits) is str:
+        return splits
+    runners = sorted((splits.loc[1:, 'RegNo'] + ': ' + splits.loc[1:, 'ResName']).to_list())
+    return SplitsResult(class_id, splits, runners)
+
+
+def get_course(event_id: str, class_id: str):
+    """Loads splits of all classes of event ``event_id``, which ran the same course as class ``class_id``\n
+    :returns CourseResult or error string"""
+    courses = course_parser.load_courses(event_id)
+    if type(courses) is str:
+        return courses
+    course = course_parser.find_course(courses, class_id)
+    if course is None:
+        return 'ID kategorie ' + class_id
+    splits = course.splits
+    runners = sorted((splits.loc[1:, 'RegNo'] + ': ' + splits.loc[1:, 'ResName']).to_list())
+    return CourseResult(event_id, course.name, course.class_ids, splits, runners)
+
+
+def get_courses(event_id: str):
+    """Lists courses of event ``event_id``: classes, which ran them, and count of runners\n
+    :returns DataFrame or error string"""
+    courses = course_parser.load_courses(event_id)
+    if type(courses) is str:
+        return courses
+    return pandas.DataFrame({'Classes': [c.name for c in courses], 'ClassIDs': [','.join(c.class_ids) for c in courses],
+                             'Runners': [len(c.splits.index) for c in courses]})
+
+
+def get_event(event_id: str):
+    """Loads event ``event_id`` with its categories\n
+    :returns EventResult or error string"""
+    classes, info, categories = splits_parser.load_categories(event_id)
+    if type(classes) is str:
+        return classes
+    if metadata_store.get_event(event_id) is None:
+        metadata_store.add_event(event_id, info, categories)
+    return EventResult(event_id, info, categories, classes)
+
+
+def get_category_id(event_id: str, category: str) -> str:
+    """Finds ID of ``category`` (name ignoring case and whitespace) of event ``event_id``\n
+    :returns ID, 'err' for unknown category or error string of event"""
+    if metadata_store.get_event(event_id) is None:
+        event = get_event(event_id)
+        if type(event) is str:
+            return event
+    return metadata_store.find_category(event_id, category) or 'err'
+
+
+def suggest_categories(event_id: str, category: str) -> list:
+    """Names of categories of (already loaded) event ``event_id`` similar to mistyped ``category``"""
+    return metadata_store.suggest_categories(event_id, category)
+
+
+def get_calendar(year: str, mask: str = '', levels: list = (), all_sports: bool = False, all_events: bool = False,
+                 whole_season: bool = True):
+    """Loads events in ``year`` (or last ``constants.RECENT_DAYS``, when not ``whole_season``) filtered by name
+    ``mask`` and ``levels``\n
+    :returns DataFrame or error string"""
+    return calendar_store.get_events(year, mask, list(levels), all_sports, all_events, whole_season, True)
+
+
+def get_runner(reg_no: str, year: str):
+    """Loads results of runner ``reg_no`` in ``year``\n
+    :returns RunnerResult or error string"""
+    results, info = runner_parser.load_results(reg_no, year)
+    if type(results) is str:
+        return results
+    return RunnerResult(reg_no.upper(), year, info, results)
+
+
+def get_runner_history(reg_no: str, years: list = constants.YEARS):
+    """Loads results of runner ``reg_no`` in all ``years`` (table has Season column), finished seasons are stored
+    permanently (see ``runner_history.load_history``)\n
+    :returns RunnerResult (with 'first-last' year) or error string"""
+    results, info = runner_history.load_history(reg_no, list(years))
+    if type(results) is str:
+        return results
+    return RunnerResult(reg_no.upper(), min(years) + '-' + max(years), info, results)
+
+
+def get_club(reg_nos: list, year: str):
+    """Loads results of all runners with ``reg_nos`` in ``year`` into one table\n
+    :returns DataFrame or error string"""
+    return runner_parser.load_club_results(reg_nos, year)
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+import pandas
+from app.src import constants, metadata_store, splits_parser, timings
+
+Season = namedtuple('Season', ['events', 'frozen', 'frozen_until', 'refreshed'])
+
+_seasons = {}
+_season_locks = {}
+_lock = threading.Lock()
+
+
+def get_frozen_until(year: str) -> str:
+    """Last date of ``year``, whose events are not expected to change any more: end of the month before
+    ``constants.CALENDAR_REFRESH_DAYS`` ago (so the request stays the same for the whole month)\n
+    :returns date as 'YYYY-MM-DD' or empty string, when the whole year is open"""
+    boundary = (date.today() - timedelta(days=constants.CALENDAR_REFRESH_DAYS)).replace(day=1) - timedelta(days=1)
+    if boundary.year > int(year):
+        return year + '-12-31'
+    if boundary.year < int(year):
+        return ''
+    return boundary.isoformat()
+
+
+def download(date_from: str, date_to: str, all_events: bool):
+    """Loads events of all sports and levels between ``date_from`` and ``date_to``\n
+    :returns DataFrame (possibly empty) or error string"""
+    values = {'format': 'json',
+              'method': 'getEventList',
+              'datefrom': date_from,
+              'dateto': date_to,
+              'all': '1' if all_events else '0'}
+    data = splits_parser.load_events(values)
+    if type(data) is str and data == 'not found':
+        return pandas.DataFrame(columns=splits_parser.EVENT_COLUMNS)
+    return data
+
+
+def get_season(year: str, all_events: bool):
+    """Returns all (supported) events of ``year``, season is downloaded only once\n
+    Open part of current season (after ``get_frozen_until``) is downloaded again after
+    ``constants.CALENDAR_REFRESH`` seconds, the frozen part is kept\n
+    Different seasons are downloaded concurrently, the same season only once at a time\n
+    :returns DataFrame or error string"""
+    key = (year, all_events)
+    with _lock:
+        season = _seasons.get(key)
+        season_lock = _season_locks.setdefault(key, threading.Lock())
+    frozen_until = get_frozen_until(year)
+    if is_fresh(season, year, frozen_until):
+        return season.events
+    with season_lock:
+        with _lock:
+            season = _seasons.get(key)
+        if is_fresh(season, year, frozen_until):
+            return season.events
+        frozen = season.frozen if season is not None and season.frozen_until == frozen_until else None
+        if frozen is None and frozen_until != '':
+            frozen = download(year + '-01-01', frozen_until, all_events)
+            if type(frozen) is str:
+                return frozen
+        parts = [] if frozen is None else [frozen]
+        if frozen_until != year + '-12-31':
+            date_from = year + '-01-01'
+            if frozen_until != '':
+                date_from = (date.fromisoformat(frozen_until) + timedelta(days=1)).isoformat()
+            recent = download(date_from, year + '-12-31', all_events)
+            if type(recent) is str:
+                return recent if season is None else season.events
+            parts.append(recent)
+        events = pandas.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        with _lock:
+            _seasons[key] = Season(events, frozen, frozen_until, time.time())
+        metadata_store.add_calendar(events)
+        return events
+
+
+def is_fresh(season, year: str, frozen_until: str) -> bool:
+    """Decides whether kept ``season`` (Season or None) may be returned without download"""
+    return season is not None and (frozen_until == year + '-12-31'
+                                   or time.time() - season.refreshed < constants.CALENDAR_REFRESH)
+
+
+def get_calendar(year: str, all_events: bool, date_from: str = '', date_to: str = ''):
+    """Returns events between ``date_from`` and ``date_to`` (both 'YYYY-MM-DD', whole ``year`` by default),
+    range may span more seasons\n
+    :returns DataFrame or error string"""
+    if date_from == '':
+        return get_season(year, all_events)
+    parts = []
+    for y in range(int(date_from[:4]), int(date_to[:4]) + 1):
+        events = get_season(str(y), all_events)
+        if type(events) is str:
+            return events
+        parts.append(events[(events['DateStr'] >= date_from) & (events['DateStr'] <= date_to)])
+    return pandas.concat(parts, ignore_index=True)
+
+
+def get_date_range(whole_season: bool):
+    """Date range of shown events: ``whole_season`` or previous ``constants.RECENT_DAYS``\n
+    :returns pair of 'YYYY-MM-DD' dates (or empty strings for whole season)"""
+    if whole_season:
+        return '', ''
+    today = date.today()
+    return (today - timedelta(days=constants.RECENT_DAYS)).isoformat(), today.isoformat()
+
+
+@timings.timed('load_event_calendar')
+def get_events(year: str, mask: str, levels: list, all_sports: bool, all_events: bool, whole_season: bool,
+               drop_date: bool):
+    """Takes events of season (current one for empty ``year``) and filters them locally by all given parameters\n
+    May show ``all_sports`` or only Foot-O, ``all events`` with unofficial ones or just official,
+    only some event ``levels``, events with ``mask`` name, whole season or recent events (see ``get_date_range``)\n
+    :returns DataFrame/error string"""
+    if year == '':
+        year = str(date.today().year)
+    date_from, date_to = get_date_range(whole_season)
+    data = get_calendar(year, all_events, date_from, date_to)
+    if type(data) is pandas.DataFrame:
+        data = filter_events(data, mask, levels, all_sports)
+        if data.empty:
+            return 'not found'
+        data = data.drop(['SportID', 'LevelID'], axis=1)
+        if drop_date:
+            data = data.drop('DateStr', axis=1)
+        if not all_sports:
+            data = data.drop('Sport', axis=1)
+    return data
+
+
+def filter_events(events: pandas.DataFrame, mask: str, levels: list, all_sports: bool) -> pandas.DataFrame:
+    """Filters events locally by (case-insensitive) part of name ``mask``, event ``levels`` ('ID: name' options)
+    and sport (only Foot-O, unless ``all_sports``)\n
+    :returns new DataFrame"""
+    selected = pandas.Series(True, index=events.index)
+    if not all_sports:
+        selected &= events['SportID'] == '1'
+    if mask != '':
+        selected &= events['Name'].str.contains(mask, case=False, regex=False)
+    if len(levels) != 0:
+        selected &= events['LevelID'].isin([i.split(':')[0] for i in levels])
+    return events[selected].reset_index(drop=True)
+
+
+def clear():
+    with _lock:
+        _seasons.clear()
@@ -1,5 +1,8 @@
+import os
+
 # Selectbox options
 YEARS = ['2022', '2021', '2020', '2019', '2018', '2017', '2016', '2015', '2014', '2013']
+YEARS_ALL = 'Všechny sezóny'
 EVENT_LEVELS = ['1: MČR', '8: ČP + ŽA', '3: ŽB', '11: OM', '4: OŽ', '5: E', '14: OF', '6: OST ( + zobrazit neoficiální závody)']
 RUNNERS_LIMIT = ['none', '3', '4', '5', '6', '7', '8', '9', '10', '12', '14', '16', '18', '20', '25', '30']
 
@@ -9,20 +12,85 @@ SUPPORTED_DISCIPLINES = ['KL', 'KT', 'SP', 'NOB']
 LEVEL_SHORTCUTS = [['ČP', 'MČR'], ['ŽB'], ['OŽ', 'OM', 'E', 'OF']]
 
 # URL adresses
-URL_CATEGORIES = 'https://oris.orientacnisporty.cz/API/?format=json&method=getEvent&id='
-URL_USER_ID = 'https://oris.orientacnisporty.cz/API/?format=json&method=getUser&rgnum='
-URL_RESULTS = 'https://oris.orientacnisporty.cz/API/?format=json&method=getEventResults&eventid='
 URL = 'https://oris.orientacnisporty.cz/API/?'
 
+# Splits loading - sentinel values of time columns (seconds) and of place columns
+TIME_DISK = -1
+TIME_DNS = -2
+TIME_MISSING = -3
+PLACE_NONE = 0
+
+# Splits loading - count of memoized split tables and events
+SPLITS_CACHE_SIZE = 128
+
+# Table views - count of memoized derived tables (per class and view)
+VIEW_CACHE_SIZE = 64
+
 # Splits loading - modes return values
 MODE_SPLITS = 0
 MODE_CATEGORIES = 1
 MODE_EVENTS = 2
 
+# ORIS response cache - path to cache database ('' disables cache), size limit in bytes and expiration in seconds
+CACHE_PATH = os.environ.get('ORIS_CACHE_PATH', './cache/oris.sqlite')
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+CACHE_TTL = 60 * 60
+CACHE_USER_TTL = 24 * 60 * 60
+CACHE_FINISHED_DAYS = 3
+
+# Event calendar - seconds between refreshes of current season, days back from today, whose events may still change
+CALENDAR_REFRESH = 60 * 60
+CALENDAR_REFRESH_DAYS = 30
+
+# Recent events - days back from today shown in default calendar view and prefetched at startup
+RECENT_DAYS = 30
+
+# Prefetch of recent events - enabled (ORIS_PREFETCH=0 disables it), seconds between rounds, max loads per second
+PREFETCH_ENABLED = os.environ.get('ORIS_PREFETCH', '1') != '0'
+PREFETCH_INTERVAL = 30 * 60
+PREFETCH_RATE = 2
+
+# Splits archive - directory of season archive ('' disables archive)
+ARCHIVE_PATH = os.environ.get('ORIS_ARCHIVE_PATH', './cache/archive')
+
+# Pdf export - directory of exported files, count of kept files, count of exports running at once
+EXPORT_PATH = os.environ.get('ORIS_EXPORT_PATH', './cache/exports')
+EXPORT_FILES_KEPT = 64
+EXPORT_WORKERS = 2
+
+# Concurrent loading - max count of ORIS requests in flight
+MAX_PARALLEL_REQUESTS = 8
+
+# ORIS client - timeout in seconds, retries of failed requests with exponential backoff, count of kept timings
+REQUEST_TIMEOUT = 20
+REQUEST_RETRIES = 3
+REQUEST_BACKOFF = 0.5
+REQUEST_TIMINGS_KEPT = 1000
+
+# Timing spans - count of kept spans for diagnostics panel
+TIMING_SPANS_KEPT = 5000
+
+# Runner results loading - seconds to keep finished job, count of kept finished jobs, page refresh interval
+RUNNER_JOB_TTL = 60 * 60
+RUNNER_JOBS_KEPT = 32
+RUNNER_POLL_INTERVAL = 0.5
+
+# Runner results - error of entries request refused by ORIS (unlike 'error' of runner without entries)
+ENTRIES_UNAVAILABLE = 'entries unavailable'
+
+# Runner history - count of seasons loaded at once (ORIS requests are divided among them)
+HISTORY_PARALLEL_SEASONS = 4
+
+# Split analytics - leg slower than runner's median pace by this ratio is a mistake, count of memoized classes
+ANALYSIS_MISTAKE_THRESHOLD = 0.15
+ANALYSIS_CACHE_SIZE = 64
+
 # Graph options
 GRAPH_HEIGHT = 600
 GRAPH_WIDTH = 1000
 GRAPH_LEGEND_SIZE = 22
+GRAPH_WEBGL_THRESHOLD = 100
+GRAPH_HIGHLIGHT_WIDTH = 4
 GRAPH_RUNNER_DISCIPLINES = ['Sprint', 'Krátká', 'Klasika']
 GRAPH_LEVEL_TEXT = ['<b>MČR & Český Pohár & Žebříček A</b>', '<b>Žebříček B</b>', '<b>Oblastní závody & Etapové</b>']
 
@@ -33,5 +101,7 @@ CELL_WIDTH = 12
 INDEX_CELL_WIDTH = 35
 FRONT_CELL_WIDTH = 16
 FONT_SIZE = 6.8
+TABLE_COLUMNS = 16
 LINE_OFFSET = INDEX_CELL_WIDTH + 3 * FRONT_CELL_WIDTH
 GRAPH_SCALE = 280
+GRAPH_IMAGE_CACHE_SIZE = 32
@@ -0,0 +1,73 @@
+import functools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas
+from app.src import analytics, constants, splits_parser, timings
+
+Course = namedtuple('Course', ['name', 'class_ids', 'splits'])
+
+
+def get_course_key(row, splits: pandas.DataFrame) -> tuple:
+    """Signature of course of one class: distance, climbing and controls of the class (from getEvent)
+    and count of split columns (ORIS splits do not contain control codes)"""
+    return row['Distance'], row['Climbing'], row['Controls'], len(splits.filter(regex="SplitTime.*").columns)
+
+
+@functools.lru_cache(maxsize=constants.SPLITS_CACHE_SIZE)
+@timings.timed('load_courses')
+def load_courses(event_id: str, max_workers: int = constants.MAX_PARALLEL_REQUESTS):
+    """Loads splits of all classes of event concurrently and merges classes, which ran the same course
+    (see ``get_course_key``), into one table (see ``merge_splits``)\n
+    :returns list of Course (in order of event classes, classes without splits are left out) or error string"""
+    classes, info, categories = splits_parser.load_categories(event_id)
+    if type(classes) is str:
+        return classes
+    class_ids = classes.index.to_list()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(class_ids)))) as pool:
+        loaded = list(pool.map(splits_parser.load_splits, class_ids))
+    groups = {}
+    for class_id, splits in zip(class_ids, loaded):
+        if type(splits) is str:
+            continue
+        groups.setdefault(get_course_key(classes.loc[class_id], splits), []).append((class_id, splits))
+    courses = []
+    for group in groups.values():
+        ids = [class_id for class_id, _ in group]
+        names = [categories[class_id] for class_id in ids]
+        courses.append(Course(', '.join(names), ids, merge_splits([s for _, s in group], names)))
+    return courses
+
+
+def find_course(courses: list, class_id: str):
+    """Returns Course with class ``class_id`` or None"""
+    for course in courses:
+        if class_id in course.class_ids:
+            return course
+    return None
+
+
+def merge_splits(tables: list, names: list) -> pandas.DataFrame:
+    """Concatenates splits tables of classes ``names`` with Class column, ranks all runners together:
+    places of every control, result place and loss to the new winner are recomputed, rows are ordered by result"""
+    data = pandas.concat([t.assign(Class=name) for t, name in zip(tables, names)], ignore_index=True)
+    if len(tables) == 1:
+        return data
+    finish = data['TotalTime999'].to_numpy()
+    finished = finish >= 0
+    for kind in ('Total', 'Split'):
+        times = data.filter(regex=kind + "Time.*")
+        matrix = times.to_numpy(dtype=np.float64)
+        matrix[(matrix < 0) | ~finished[:, None]] = np.nan
+        places = analytics.rank_columns(matrix)
+        for i, column in enumerate(times.columns):
+            data[column.replace('Time', 'Place')] = places[:, i]
+    order = np.lexsort((np.where(finished, finish, 0), ~finished))
+    data = data.iloc[order].reset_index(drop=True)
+    finish = data['TotalTime999'].to_numpy()
+    finished = finish >= 0
+    place = np.char.add(data['TotalPlace999'].to_numpy().astype(str), '.')
+    data['ResPlace'] = np.where(finished, place, '').astype(object)
+    loss = np.char.add('+', splits_parser.format_times(finish - (finish[0] if finished.any() else 0)).astype(str))
+    data['ResLoss'] = np.where(finished, loss, '').astype(object)
+    return data
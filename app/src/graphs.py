@@ -1,21 +1,14 @@
 import datetime
 import re
+from collections import namedtuple
+import numpy
 import pandas
 import plotly.graph_objects as go
-from datetime import time
-from app.src import constants
+from app.src import constants, timings
 
+BASE_DATE = pandas.Timestamp(2017, 1, 1)
 
-def to_time(x: str) -> datetime:
-    """Transforms string text in datetime value (with fixed date)"""
-    if x.count(':') != 2:
-        x = '00:' + x
-    p = x.split(':')
-    mins = int(p[1])
-    if mins >= 60:
-        p[0] = str(mins // 60)
-        p[1] = str(mins % 60)
-    return datetime.datetime.combine(datetime.date(2017, 1, 1), time(int(p[0]), int(p[1]), int(p[2])))
+SplitsGraph = namedtuple('SplitsGraph', ['figure', 'runners', 'reg_nos', 'highlighted'])
 
 
 def to_date(x: str) -> datetime:
@@ -24,43 +17,48 @@ def to_date(x: str) -> datetime:
     return datetime.date(int(p[2]), int(p[1]), int(p[0]))
 
 
-def to_relative(x: datetime, leader: datetime) -> datetime:
-    """Calculates difference between ``x`` and current ``leader``"""
-    diff = x - leader
-    hours, remainder = divmod(diff.seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    return datetime.datetime.combine(datetime.date(2017, 1, 1), time(hours, minutes, seconds))
+def to_datetime(data: pandas.DataFrame) -> pandas.DataFrame:
+    """Transforms int seconds in datetime values (with fixed date), sentinels (negative values) in NaT"""
+    return data.where(data >= 0).apply(lambda c: BASE_DATE + pandas.to_timedelta(c, unit='s'))
 
 
-def get_plotly_splits_prepare_data(splits: pandas.DataFrame, limit: str, filtered: list):
-    """Prepares DataFrame for plotting:
-    filters total time and name, renames columns, adds start column, drops disqualified runners\n
-    :returns ``data``, table indexes and frame with just``name`` column"""
-    data = splits.filter(regex="ResName|RegNo|TotalTime.*")
+def select_runners(splits: pandas.DataFrame, limit: str, filtered: list) -> pandas.Index:
+    """Chooses runners shown in graph: first ``limit`` runners or ``filtered`` runners with the winner
+    (at most ``constants.GRAPH_LEGEND_SIZE`` of them with 'crop' limit)\n
+    :returns table indexes of chosen runners"""
+    data = splits[['RegNo']]
     if limit != 'none' and limit != 'crop':
         data = data.iloc[:int(limit), :]
     if filtered:
-        filtered.append(data.loc[0, 'RegNo'])
-        data = data[data.RegNo.isin(filtered)]
+        data = data[data.RegNo.isin(list(filtered) + [data.loc[0, 'RegNo']])]
     if limit == 'crop':
         if len(data.index) > constants.GRAPH_LEGEND_SIZE:
             data = data.iloc[:constants.GRAPH_LEGEND_SIZE, :]
-    data = data.drop('RegNo', axis=1)
+    return data.index
+
+
+@timings.timed('get_plotly_splits_prepare_data')
+def get_plotly_splits_prepare_data(splits: pandas.DataFrame, limit: str, filtered: list):
+    """Prepares DataFrame for plotting:
+    filters total time and name of runners chosen by ``select_runners``, renames columns, adds start column,
+    drops disqualified runners\n
+    :returns ``data``, table indexes and frame with just``name`` column"""
+    data = splits.loc[select_runners(splits, limit, filtered)].filter(regex="ResName|TotalTime.*")
     data = data.rename(columns=lambda x: re.sub('TotalTime', 'K', x))
     data = data.rename(columns=lambda x: re.sub('K999', 'F', x))
-    data = data[(data.F != 'DISK') & (data.F != 'DNS')]
+    data = data[(data.F != constants.TIME_DISK) & (data.F != constants.TIME_DNS)]
     runners = data.index.to_list()
     names = data['ResName'].copy()
-    data.rename(columns={'ResName': 'S'}, inplace=True)
-    data['S'] = '00:00'
-    cols = data.columns.to_list()
-    for a in cols:
-        data[a] = data[a].apply(to_time)
-    return data, runners, names
+    data = data.rename(columns={'ResName': 'S'})
+    data['S'] = 0
+    return to_datetime(data), runners, names
 
 
 def get_plotly_fill_graph(data: pandas.DataFrame, runners: list, names: pandas.DataFrame) -> go.Figure:
-    """Fills graph object with given ``data``, lines are named by ``names``, returns graph object Figure"""
+    """Fills graph object with given ``data``, lines are named by ``names``, returns graph object Figure\n
+    Graphs with more than ``constants.GRAPH_WEBGL_THRESHOLD`` runners are rendered by WebGL"""
+    if len(runners) > constants.GRAPH_WEBGL_THRESHOLD:
+        return get_plotly_fill_graph_gl(data, runners, names)
     fig = go.Figure()
 
     for r in runners:
@@ -74,6 +72,18 @@ def get_plotly_fill_graph(data: pandas.DataFrame, runners: list, names: pandas.D
     return fig
 
 
+def get_plotly_fill_graph_gl(data: pandas.DataFrame, runners: list, names: pandas.DataFrame) -> go.Figure:
+    """Fills graph object with Scattergl traces sharing one x array, times are sent as numbers
+    (milliseconds from midnight, displayed on date axis) instead of datetime strings"""
+    x = data.columns.to_list()
+    values = ((data - BASE_DATE) / pandas.Timedelta(milliseconds=1)).to_numpy()
+    traces = [go.Scattergl(y=values[i], x=x, name=names.loc[r], mode='lines') for i, r in enumerate(runners)]
+    fig = go.Figure(data=traces)
+    fig.update_yaxes(type='date', tickformat='%H:%M:%S', hoverformat='%H:%M:%S')
+    return fig
+
+
+@timings.timed('get_plotly_splits_absolute')
 def get_plotly_splits_absolute(splits: pandas.DataFrame, limit: str, filtered: list) -> go.Figure:
     """Plots absolute time graph for ``splits`` table with ``limit`` runners"""
     data, runners, names = get_plotly_splits_prepare_data(splits, limit, filtered)
@@ -95,13 +105,19 @@ def get_plotly_splits_absolute(splits: pandas.DataFrame, limit: str, filtered: l
     return fig
 
 
+def get_leader_times(splits: pandas.DataFrame) -> pandas.Series:
+    """Times of running leader at every control: best time of all runners of ``splits``, not only the shown ones"""
+    data, runners, names = get_plotly_splits_prepare_data(splits, 'none', [])
+    return data.min()
+
+
+@timings.timed('get_plotly_splits_relative')
 def get_plotly_splits_relative(splits: pandas.DataFrame, limit: str, filtered: list) -> go.Figure:
-    """Plots relative loss-to-leader graph for ``splits`` table with ``limit`` runners"""
+    """Plots relative loss-to-leader graph for ``splits`` table with ``limit`` runners,
+    loss is measured to the leader of all runners (see ``get_leader_times``)"""
     data, runners, names = get_plotly_splits_prepare_data(splits, limit, filtered)
-    minimum = data.min()
-    cols = data.columns.to_list()
-    for a in cols:
-        data[a] = data[a].apply(lambda x: to_relative(x, minimum.loc[a]))
+    leader = data.min() if limit == 'none' and not filtered else get_leader_times(splits)
+    data = (data - leader) + BASE_DATE
 
     fig = get_plotly_fill_graph(data, runners, names)
 
@@ -119,6 +135,37 @@ def get_plotly_splits_relative(splits: pandas.DataFrame, limit: str, filtered: l
     return fig
 
 
+def get_plotly_splits_graph(splits: pandas.DataFrame, show_relative: bool) -> SplitsGraph:
+    """Plots absolute/relative graph with all runners of ``splits`` table once, shown runners are then
+    chosen by ``update_plotly_splits_graph`` without rebuilding their traces\n
+    :returns SplitsGraph with figure, table indexes and RegNo of its traces and their current state"""
+    if show_relative:
+        fig = get_plotly_splits_relative(splits, 'none', [])
+    else:
+        fig = get_plotly_splits_absolute(splits, 'none', [])
+    finish = splits['TotalTime999']
+    shown = splits[(finish != constants.TIME_DISK) & (finish != constants.TIME_DNS)]
+    count = len(shown.index)
+    return SplitsGraph(fig, shown.index.to_numpy(), shown['RegNo'].to_numpy(), numpy.zeros(count, dtype=bool))
+
+
+@timings.timed('update_plotly_splits_graph')
+def update_plotly_splits_graph(graph: SplitsGraph, splits: pandas.DataFrame, limit: str, filtered: list) -> go.Figure:
+    """Highlights ``filtered`` runners in ``graph`` (only traces, whose state changed, are modified)
+    and chooses runners shown by ``select_runners``\n
+    :returns figure of ``graph`` or, for limited view, new figure with just the shown traces
+    (hidden traces are not sent to the browser)"""
+    highlighted = numpy.isin(graph.reg_nos, filtered)
+    for i in numpy.flatnonzero(highlighted != graph.highlighted):
+        graph.figure.data[i].line.width = constants.GRAPH_HIGHLIGHT_WIDTH if highlighted[i] else None
+    graph.highlighted[:] = highlighted
+    visible = numpy.isin(graph.runners, select_runners(splits, limit, filtered))
+    if visible.all():
+        return graph.figure
+    return go.Figure(data=[graph.figure.data[i] for i in numpy.flatnonzero(visible)], layout=graph.figure.layout)
+
+
+@timings.timed('get_plotly_runner_event_level')
 def get_plotly_runner_event_level(events: pandas.DataFrame, level: int) -> go.Figure:
     data = events.copy()
     data['Date'] = data['Date'].apply(lambda x: to_date(x))
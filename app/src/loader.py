@@ -1,113 +1,152 @@
 import re
+import threading
+from collections import OrderedDict
+import numpy
 import pandas
 
-from app.gui import streamlitapp as sapp
-from app.src import runner_parser
-from app.src import constants, splits_parser, graphs
-from datetime import date, timedelta
-import streamlit as st
+from app.src import api, metadata_store, prefetch, runner_history, runner_parser, runner_stream
+from app.src import constants, splits_parser, analytics, timings
+
+_views = OrderedDict()
+_views_lock = threading.Lock()
 
 
 def load_splits(category: str, event_id: str, event_year: str, mask: str, levels: list, all_sports: bool, all_events: bool, whole_season: bool):
-    """Calls appropriate DataFrame loader according to provided parameters\n
-    :returns load_mode, DataFrame/error string"""
+    """Calls appropriate loader according to provided parameters\n
+    :returns load_mode, SplitsResult/EventResult/DataFrame/error string"""
     if category != '':
-        entity = splits_parser.load_splits(category)
-        if type(entity) is pandas.DataFrame:
-            sapp.category_runners = sorted((entity.loc[1:, 'RegNo'] + ': ' + entity.loc[1:, 'ResName']).to_list())
-        return constants.MODE_SPLITS, entity
+        prefetch.record_visit('class:' + category)
+        return constants.MODE_SPLITS, api.get_splits(category)
     elif event_id != '':
-        sapp.event_id = event_id
-        entity, info, categories = splits_parser.load_categories(event_id)
-        sapp.event_info = info
-        sapp.event_categories = categories
-        return constants.MODE_CATEGORIES, entity
-    else:
-        return load_event_calendar(event_year, mask, levels, all_sports, all_events, whole_season, True)
-
-
-def load_events_parse_data(year: str, mask: str, levels: list, all_sports: bool, all_events: bool, whole_season: bool):
-    """Creates a dictionary of URL parameters for event loading\n
-    May show ``all_sports`` or only Foot-O, ``all events`` with unofficial ones or just official,
-    only some event ``levels``, events with ``mask`` name and in given ``year``\n
-    :returns dictionary of ``values``"""
-    values = {'format': 'json',
-              'method': 'getEventList'}
-    if whole_season:
-        values['datefrom'] = year + '-01-01'
-        values['dateto'] = year + '-12-31'
+        prefetch.record_visit('event:' + event_id)
+        return constants.MODE_CATEGORIES, api.get_event(event_id)
     else:
-        today = date.today()
-        past = today - timedelta(days=30)
-        values['datefrom'] = str(past.year) + '-' + past.strftime('%m') + '-' + past.strftime('%d')
-        values['dateto'] = str(today.year) + '-' + today.strftime('%m') + '-' + today.strftime('%d')
-    if all_events:
-        values['all'] = '1'
-    else:
-        values['all'] = '0'
-    if not all_sports:
-        values['sport'] = '1'
-    if mask != '':
-        values['name'] = mask
-    if len(levels) != 0:
-        arr = []
-        for i in levels:
-            arr.append(i.split(':')[0])
-        values['level'] = ",".join(arr)
-    return values
-
-
-#@st.cache(allow_output_mutation=True)
-def load_event_calendar(event_year: str, mask: str, levels: list, all_sports: bool, all_events: bool, whole_season: bool, drop_date: bool):
-    """Parses all given parameters to json and then calls request with these parameters\n
+        return load_event_calendar(event_year, mask, levels, all_sports, all_events, whole_season)
+
+
+def load_event_calendar(event_year: str, mask: str, levels: list, all_sports: bool, all_events: bool, whole_season: bool):
+    """Loads events of season filtered by all given parameters (see ``api.get_calendar``)\n
     :returns load_mode, DataFrame/error string"""
-    if event_year == '':
-        event_year = (str(date.today().year))
-    values = load_events_parse_data(event_year, mask, levels, all_sports, all_events, whole_season)
-    data = splits_parser.load_events(values)
-    if type(data) is pandas.DataFrame:
-        if drop_date:
-            data.drop('DateStr', axis=1, inplace=True)
-        if not all_sports:
-            data.drop('Sport', axis=1, inplace=True)
-    return constants.MODE_EVENTS, data
+    return constants.MODE_EVENTS, api.get_calendar(event_year, mask, levels, all_sports, all_events, whole_season)
+
+
+def load_event(event_id: str):
+    """Loads event info and its categories
+    returns EventResult or string error message"""
+    return api.get_event(event_id)
 
 
 def load_runner(reg_no: str, year: str):
     """Loads all events, where runner with ``reg_no`` in ``year`` competed
-    returns DataFrame or string error message for invalid reg_no"""
-    entity, info = runner_parser.load_results(reg_no, year)
-    sapp.runner_info = info
-    return entity
+    returns RunnerResult or string error message for invalid reg_no"""
+    return api.get_runner(reg_no, year)
+
+
+def load_runner_history(reg_no: str):
+    """Loads results of runner with ``reg_no`` in all seasons of ``constants.YEARS``
+    returns DataFrame/error string and runner info list"""
+    return runner_history.load_history(reg_no, constants.YEARS)
+
+
+def start_prefetch() -> bool:
+    """Starts background prefetch of recent events (only once), see ``prefetch.start``"""
+    return prefetch.start()
+
+
+def get_prefetch_stats() -> dict:
+    return prefetch.get_stats()
+
+
+def start_runner(reg_no: str, year: str) -> dict:
+    """Starts (or joins already running) loading of events of runner with ``reg_no`` in ``year`` in background
+    returns job dictionary, see ``runner_stream.start``"""
+    return runner_stream.start(reg_no, year)
+
+
+def get_runner_results(job: dict):
+    """Table of runner's results loaded so far and count of processed events"""
+    return runner_stream.get_results(job)
+
+
+def load_club(reg_nos: list, year: str):
+    """Loads all events of all runners with ``reg_nos`` in ``year`` into one table
+    returns DataFrame or string error message"""
+    return runner_parser.load_club_results(reg_nos, year)
+
+
+def load_course(event_id: str, class_id: str):
+    """Loads merged splits of all categories of event, which ran the same course as category ``class_id``
+    returns CourseResult or string error message"""
+    return api.get_course(event_id, class_id)
 
 
 def get_category_id_from_name(category: str, event_id: str) -> str:
     """Converts category name in its ID, returns ID as string or 'err'"""
-    if sapp.event_id == '' or sapp.event_id != event_id:
-        ret = splits_parser.load_categories(event_id)
-        if type(ret) == str:
-            return ret
-    key_list = list(sapp.event_categories.keys())
-    val_list = list(sapp.event_categories.values())
-    for i in range(len(val_list)):
-        val_list[i] = val_list[i].upper()
-
-    try:
-        position = val_list.index(category.upper())
-        return key_list[position]
-    except ValueError:
-        return 'err'
+    return api.get_category_id(event_id, category)
+
+
+def get_category_names(event_id: str) -> list:
+    """Names of categories of event for sidebar selection, loaded event is kept in metadata store\n
+    :returns list of names (empty for invalid event)"""
+    event = api.get_event(event_id)
+    if type(event) is str:
+        return []
+    return list(event.categories.values())
+
+
+def get_event_name(event_id: str) -> str:
+    """Name of event known from calendar or loaded events (no request is sent)"""
+    return metadata_store.get_event_name(event_id)
+
+
+def suggest_categories(category: str, event_id: str) -> list:
+    """Names of event categories similar to mistyped ``category``"""
+    return api.suggest_categories(event_id, category)
 
 
 def load_split_graphs(data: pandas.DataFrame, show_relative: bool, limit: str, filtered: list):
     """Creates an absolute/relative graph with limited count of filtered"""
+    from app.src import graphs
     if show_relative:
         return graphs.get_plotly_splits_relative(data, limit, filtered)
     return graphs.get_plotly_splits_absolute(data, limit, filtered)
 
 
+def create_split_graph(data: pandas.DataFrame, show_relative: bool):
+    """Creates an absolute/relative graph with all runners, which is then updated by ``update_split_graph``"""
+    from app.src import graphs
+    return graphs.get_plotly_splits_graph(data, show_relative)
+
+
+def update_split_graph(graph, data: pandas.DataFrame, limit: str, filtered: list):
+    """Shows limited count of filtered runners in graph created by ``create_split_graph``"""
+    from app.src import graphs
+    return graphs.update_plotly_splits_graph(graph, data, limit, filtered)
+
+
+@timings.timed('load_mistakes_table')
+def load_mistakes_table(class_id: str, limit: str, filtered: list, splits: pandas.DataFrame = None):
+    """Creates table with runners' loss to best legs and estimated mistake time (first ``limit`` or ``filtered`` runners)\n
+    Given ``splits`` (e.g. merged course) are analysed instead of loaded class, analysis is memoized by ``get_view``\n
+    :returns DataFrame or error string"""
+    if splits is None:
+        analysis = analytics.load_analysis(class_id)
+    else:
+        analysis = get_view(splits, class_id, 'analysis', analytics.analyse_splits)
+    if type(analysis) is str:
+        return analysis
+    data = analytics.get_mistakes_summary(analysis)
+    if filtered:
+        data = data[data['RegNo'].isin(filtered)]
+    elif limit != 'none':
+        data = data.iloc[:int(limit), :]
+    return data.assign(Loss=splits_parser.format_times(data['Loss'].to_numpy()),
+                       Mistakes=splits_parser.format_times(data['Mistakes'].to_numpy()))
+
+
 def load_runner_graphs(data: pandas.DataFrame, level: int):
     """Creates a graph with results of events of event ``level``"""
+    from app.src import graphs
     filtered = data[data['Level'].isin(constants.LEVEL_SHORTCUTS[level])]
     filtered = filtered[filtered['Place'] != 'DISK']
     if filtered.shape[0] > 0:
@@ -115,45 +154,87 @@ def load_runner_graphs(data: pandas.DataFrame, level: int):
     return ''
 
 
-def crop_and_style(splits: pandas.DataFrame, limit: str, filtered: list, splits_mode: bool):
+def get_view(splits: pandas.DataFrame, class_id: str, name: str, build):
+    """Returns derived view ``name`` of ``splits`` table created by ``build(splits)``\n
+    Views are memoized by (``class_id``, ``name``, data version), where data version is identity of ``splits``
+    (loaded tables are memoized by ``splits_parser.load_splits``, so reloaded data get new version),
+    last ``constants.VIEW_CACHE_SIZE`` views are kept. Views must not be modified by callers,
+    without ``class_id`` view is always built"""
+    if class_id == '':
+        return build(splits)
+    key = (class_id, name, id(splits))
+    with _views_lock:
+        if key in _views:
+            _views.move_to_end(key)
+            return _views[key][1]
+    view = build(splits)
+    with _views_lock:
+        # source table is kept with the view, so its id cannot be reused by other table
+        _views[key] = (splits, view)
+        while len(_views) > constants.VIEW_CACHE_SIZE:
+            _views.popitem(last=False)
+    return view
+
+
+def clear_views():
+    with _views_lock:
+        _views.clear()
+
+
+@timings.timed('crop_and_style')
+def crop_and_style(splits: pandas.DataFrame, limit: str, filtered: list, splits_mode: bool, class_id: str = ''):
     """Reshapes and styles DataFrame
     If some runners are ``filtered``, their rows are highlighted
-    If ``limit`` is set, only first n rows are displayed"""
-    data = crop_dataframe(splits, splits_mode)
+    If ``limit`` is set, only first n rows are displayed\n
+    Reshaped table is memoized for ``class_id`` (see ``get_view``), so only slicing and styling is done repeatedly"""
+    data = get_view(splits, class_id, 'table_splits' if splits_mode else 'table_total',
+                    lambda s: crop_dataframe(s, splits_mode).rename(columns=lambda x: re.sub('Res', '', x)))
     if limit != 'none':
         data = data.iloc[:int(limit), :]
-    data = data.rename(columns=lambda x: re.sub('Res', '', x))
-    data = data.style.apply(lambda r: row_styling(r, filtered), axis=1)
-    return data
+    return data.style.apply(highlight_rows, axis=None, filtered=filtered)
+
+
+@timings.timed('crop_dataframe')
+def crop_dataframe(splits: pandas.DataFrame, splits_mode: bool, class_id: str = '') -> pandas.DataFrame:
+    """Drops unnecessary time and place columns, formats times and places to text and renames some columns\n
+    Result is memoized for ``class_id`` (see ``get_view``)"""
+    return get_view(splits, class_id, 'splits' if splits_mode else 'total', lambda s: build_view(s, splits_mode))
 
 
-@st.cache
-def crop_dataframe(splits: pandas.DataFrame, splits_mode: bool) -> pandas.DataFrame:
-    """Drops unnecessary time and place columns, and renames some other"""
+def build_view(splits: pandas.DataFrame, splits_mode: bool) -> pandas.DataFrame:
+    """Creates total (or split with ``splits_mode``) time view of splits table, see ``crop_dataframe``"""
     data = splits.copy()
     data['ResPlace'] = data['ResPlace'] + ' ' + data['ResName']
     if splits_mode:
         data = data.drop(data.filter(regex="Total.*|ResName").columns, axis=1)
-        data.rename(columns={'SplitTime999': 'ToFinishTime', 'SplitPlace999': 'ToFinishPlace'}, inplace=True)
     else:
         data = data.drop(data.filter(regex="Split.*|ResName").columns, axis=1)
-        data.rename(columns={'TotalTime999': 'FinishTime', 'TotalPlace999': 'FinishPlace'}, inplace=True)
+    for x in data.filter(regex="(Total|Split)Time.*").columns:
+        data[x] = splits_parser.format_times(data[x].to_numpy())
+    for x in data.filter(regex="(Total|Split)Place.*").columns:
+        data[x] = splits_parser.format_places(data[x].to_numpy())
+    data.rename(columns={'SplitTime999': 'ToFinishTime', 'SplitPlace999': 'ToFinishPlace',
+                         'TotalTime999': 'FinishTime', 'TotalPlace999': 'FinishPlace'}, inplace=True)
     data.set_index('ResPlace', inplace=True)
-    data = data.replace('999', '---')
     return data
 
 
-# inspired by StackOverflow
-def row_styling(row, filtered):
-    color = 'white'
-    if row['RegNo'] in filtered:
-        color = 'yellow'
-    return ['background-color: %s' % color]*len(row.values)
+def highlight_rows(data: pandas.DataFrame, filtered: list) -> pandas.DataFrame:
+    """Styles of all cells at once: rows of ``filtered`` runners are yellow, the others white"""
+    is_filtered = data['RegNo'].isin(filtered).to_numpy()
+    colors = numpy.where(is_filtered, 'background-color: yellow', 'background-color: white')
+    return pandas.DataFrame(numpy.repeat(colors[:, None], data.shape[1], axis=1), index=data.index, columns=data.columns)
 
 
-def shrink_table(data: pandas.DataFrame):
+def shrink_table(data: pandas.DataFrame, class_id: str = '', splits_mode: bool = False):
     """Prepares table for pdf export: shortens column names and splits table in three parts:
-    front legend, time columns and standings columns"""
+    front legend, time columns and standings columns\n
+    Parts are memoized for ``class_id`` and ``splits_mode`` of cropped ``data`` (see ``get_view``)"""
+    return get_view(data, class_id, 'pdf_splits' if splits_mode else 'pdf_total', build_pdf_parts)
+
+
+def build_pdf_parts(data: pandas.DataFrame):
+    """Creates front legend, time columns and standings columns of pdf table, see ``shrink_table``"""
     data = data.rename(columns=lambda x: re.sub('Total|Split', '', x))
     data = data.rename(columns=lambda x: re.sub('Res|To', '', x))
     data = data.drop('Club', axis=1)
@@ -0,0 +1,71 @@
+import difflib
+import re
+import threading
+from collections import namedtuple
+
+EventMeta = namedtuple('EventMeta', ['info', 'categories', 'index'])
+
+_events = {}
+_names = {}
+_lock = threading.Lock()
+
+
+def normalize(name: str) -> str:
+    """Normalizes category name for lookup: upper case without any whitespace ('h 21 ' -> 'H21')"""
+    return re.sub(r'\s+', '', name).upper()
+
+
+def add_event(event_id: str, info: list, categories: dict):
+    """Stores event ``info`` and its ``categories`` (ID -> name) with index of normalized names"""
+    index = {}
+    for class_id, name in categories.items():
+        index.setdefault(normalize(name), class_id)
+    with _lock:
+        _events[event_id] = EventMeta(info, categories, index)
+
+
+def add_calendar(events):
+    """Stores names of calendar ``events`` (DataFrame with ID and Name) by event ID"""
+    names = dict(zip(events['ID'], events['Name']))
+    with _lock:
+        _names.update(names)
+
+
+def get_event(event_id: str):
+    """:returns EventMeta of stored event or None"""
+    return _events.get(event_id)
+
+
+def get_event_name(event_id: str) -> str:
+    """Name of event known from calendar or from loaded event, empty string for unknown event"""
+    if event_id in _names:
+        return _names[event_id]
+    meta = _events.get(event_id)
+    if meta is not None and meta.info:
+        return meta.info[0].split(': ', 1)[-1]
+    return ''
+
+
+def get_category_names(event_id: str) -> list:
+    """Names of all categories of stored event (empty for unknown event)"""
+    meta = _events.get(event_id)
+    return [] if meta is None else list(meta.categories.values())
+
+
+def find_category(event_id: str, name: str) -> str:
+    """Finds ID of category ``name`` of stored event by one lookup of normalized name
+    (so exact, case-insensitive and whitespace-insensitive matches are equal)\n
+    :returns class ID or empty string"""
+    meta = _events.get(event_id)
+    if meta is None:
+        return ''
+    return meta.index.get(normalize(name), '')
+
+
+def suggest_categories(event_id: str, name: str, count: int = 3) -> list:
+    """Names of stored event's categories most similar to (mistyped) ``name``"""
+    meta = _events.get(event_id)
+    if meta is None:
+        return []
+    matches = difflib.get_close_matches(normalize(name), list(meta.index.keys()), n=count, cutoff=0.5)
+    return [meta.categories[meta.index[m]] for m in matches]
@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import date, timedelta
+from app.src import constants, oris_client, timings
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def load_json(values: dict, object_hook=None) -> dict:
+    """Sends ORIS request with parameters ``values`` and parses json response\n
+    Response is served from persistent cache when possible, successful responses are stored in it\n
+    Decoded objects may be replaced by ``object_hook`` (see ``json.loads``) already while parsing\n
+    :returns parsed json dictionary"""
+    key = cache_key(values)
+    with timings.span('oris.' + values['method']) as record:
+        raw = cache_get(key, values)
+        hit = raw is not None
+        if not hit:
+            raw = oris_client.post(values)
+        record['cache'] = 'hit' if hit else 'miss'
+        record['bytes'] = len(raw)
+    with timings.span('json_decode') as record:
+        data = json.loads(raw, object_hook=object_hook)
+        record['bytes'] = len(raw)
+    if not hit and data['Status'] == 'OK':
+        cache_put(key, values, raw, data)
+    return data
+
+
+def cache_key(values: dict) -> str:
+    """Creates cache key from request method and sorted parameters (without format)"""
+    params = sorted((k, str(v)) for k, v in values.items() if k not in ('format', 'method'))
+    return values['method'] + '?' + urllib.parse.urlencode(params)
+
+
+def get_connection():
+    """Opens cache database for current thread, returns None when cache is disabled"""
+    if not constants.CACHE_PATH:
+        return None
+    con = getattr(_local, 'con', None)
+    if con is None or getattr(_local, 'path', '') != constants.CACHE_PATH:
+        directory = os.path.dirname(constants.CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        con = sqlite3.connect(constants.CACHE_PATH, timeout=30, isolation_level=None)
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, data BLOB, size INTEGER,'
+                    ' expires REAL, accessed REAL)')
+        con.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        con.execute('CREATE TABLE IF NOT EXISTS dates (id TEXT PRIMARY KEY, date TEXT)')
+        con.execute('CREATE TABLE IF NOT EXISTS runner_seasons (key TEXT PRIMARY KEY, info TEXT, rows TEXT,'
+                    ' final_until TEXT)')
+        _local.con = con
+        _local.path = constants.CACHE_PATH
+    return con
+
+
+def cache_get(key: str, values: dict):
+    """Looks up compressed response under ``key``, expired responses are downloaded again (response is kept
+    permanently only when ``cache_put`` stores it after its event finished, see ``get_ttl``)\n
+    :returns raw response body or None"""
+    con = get_connection()
+    if con is None:
+        return None
+    row = con.execute('SELECT data, expires FROM responses WHERE key = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    data, expires = row
+    now = time.time()
+    if expires is not None and expires < now:
+        return None
+    con.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+    return zlib.decompress(data)
+
+
+def cache_put(key: str, values: dict, raw: bytes, data: dict):
+    """Stores compressed ``raw`` response with expiration according to ``get_ttl`` and evicts
+    least recently used responses over ``constants.CACHE_MAX_SIZE``"""
+    con = get_connection()
+    if con is None:
+        return
+    with _write_lock:
+        save_dates(con, values, data)
+        ttl = get_ttl(con, values, data)
+        now = time.time()
+        blob = zlib.compress(raw)
+        # columns are named, databases of older versions have one more column
+        con.execute('INSERT OR REPLACE INTO responses (key, data, size, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+                    (key, blob, len(blob), None if ttl is None else now + ttl, now))
+        evict(con, constants.CACHE_MAX_SIZE)
+
+
+def evict(con, max_size: int):
+    """Deletes least recently used responses until total size is under ``max_size``"""
+    total = con.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+    if total <= max_size:
+        return
+    for key, size in con.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall():
+        con.execute('DELETE FROM responses WHERE key = ?', (key,))
+        total -= size
+        if total <= max_size:
+            break
+
+
+def get_ttl(con, values: dict, data: dict):
+    """Expiration of response in seconds, None for responses that never change:
+    (non-empty) results of finished events and calendars/entries of past dates"""
+    method = values['method']
+    if not data['Data']:
+        return constants.CACHE_TTL
+    if method == 'getUser':
+        return constants.CACHE_USER_TTL
+    if method in ('getEventList', 'getUserEventEntries'):
+        if values.get('dateto', '9999') < str(date.today()):
+            return None
+        return constants.CACHE_TTL
+    if is_finished(con, values):
+        return None
+    return constants.CACHE_TTL
+
+
+def is_finished(con, values: dict) -> bool:
+    """Decides whether request ``values`` target event, which ended before ``constants.CACHE_FINISHED_DAYS``"""
+    method = values['method']
+    if method == 'getEvent':
+        key = 'event:' + str(values.get('id'))
+    elif method == 'getEventResults':
+        key = 'event:' + str(values.get('eventid'))
+    elif method == 'getSplits':
+        key = 'class:' + str(values.get('classid'))
+    else:
+        return False
+    row = con.execute('SELECT date FROM dates WHERE id = ?', (key,)).fetchone()
+    if row is None:
+        return False
+    return row[0] < str(date.today() - timedelta(days=constants.CACHE_FINISHED_DAYS))
+
+
+def save_dates(con, values: dict, data: dict):
+    """Remembers dates of events (and their classes) from getEvent and getEventList responses"""
+    if not data['Data']:
+        return
+    rows = []
+    if values['method'] == 'getEvent':
+        day = data['Data'].get('Date', '')
+        rows.append(('event:' + str(values.get('id')), day))
+        classes = data['Data'].get('Classes') or {}
+        rows.extend(('class:' + str(c['ID']), day) for c in classes.values())
+    elif values['method'] == 'getEventList':
+        rows.extend(('event:' + str(e['ID']), e.get('Date', '')) for e in data['Data'].values())
+    if rows:
+        con.executemany('INSERT OR REPLACE INTO dates VALUES (?, ?)', rows)
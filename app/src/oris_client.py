@@ -0,0 +1,137 @@
+import gzip
+import http.client
+import queue
+import threading
+import time
+import urllib.parse
+from collections import deque, namedtuple
+from app.src import constants
+
+RequestTiming = namedtuple('RequestTiming', ['method', 'reused', 'connect', 'wait', 'transfer', 'total',
+                                             'size', 'wire_size', 'attempts', 'status'])
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_timings = deque(maxlen=constants.REQUEST_TIMINGS_KEPT)
+
+
+class TransientError(Exception):
+    """Server answered with status, that is worth retrying"""
+
+
+def post(values: dict) -> bytes:
+    """Sends ORIS request with parameters ``values`` (encoded in utf-8) over pooled keep-alive connection\n
+    Transient failures are retried ``constants.REQUEST_RETRIES`` times with exponential backoff\n
+    :returns raw (decompressed) response body"""
+    url = urllib.parse.urlsplit(constants.URL)
+    body = urllib.parse.urlencode(values).encode('utf-8')
+    path = url.path or '/'
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return send(url, path, body, values.get('method', ''), attempt)
+        except (OSError, http.client.HTTPException, TransientError):
+            if attempt > constants.REQUEST_RETRIES:
+                raise
+            time.sleep(constants.REQUEST_BACKOFF * 2 ** (attempt - 1))
+
+
+def send(url, path: str, body: bytes, method: str, attempt: int, fresh: bool = False) -> bytes:
+    """Sends one POST request, connection is returned to the pool only after successful response\n
+    When idle connection from pool was closed by server meanwhile, request is repeated on a ``fresh`` one"""
+    pool = get_pool(url.scheme, url.netloc)
+    start = time.perf_counter()
+    conn, reused = take_connection(pool, url.scheme, url.netloc, fresh)
+    try:
+        if conn.sock is None:
+            reused = False
+            conn.connect()
+        connected = time.perf_counter()
+        conn.request('POST', path, body, {'Content-Type': 'application/x-www-form-urlencoded',
+                                          'Accept-Encoding': 'gzip',
+                                          'Connection': 'keep-alive'})
+        response = conn.getresponse()
+        answered = time.perf_counter()
+        raw = response.read()
+        finished = time.perf_counter()
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        if not reused:
+            raise
+        return send(url, path, body, method, attempt, True)
+    if response.status in RETRY_STATUSES:
+        conn.close()
+        raise TransientError('HTTP %d' % response.status)
+    if response.will_close:
+        conn.close()
+    else:
+        release_connection(pool, conn)
+    data = raw
+    if response.getheader('Content-Encoding', '') == 'gzip':
+        data = gzip.decompress(raw)
+    _timings.append(RequestTiming(method, reused, connected - start, answered - connected, finished - answered,
+                                  finished - start, len(data), len(raw), attempt, response.status))
+    return data
+
+
+def get_pool(scheme: str, netloc: str) -> queue.LifoQueue:
+    """Returns queue of idle connections for given host"""
+    with _pools_lock:
+        if (scheme, netloc) not in _pools:
+            _pools[(scheme, netloc)] = queue.LifoQueue(maxsize=constants.MAX_PARALLEL_REQUESTS)
+        return _pools[(scheme, netloc)]
+
+
+def take_connection(pool: queue.LifoQueue, scheme: str, netloc: str, fresh: bool = False):
+    """Takes idle connection from ``pool`` (unless ``fresh`` is required) or opens a new one\n
+    :returns connection and whether it was reused"""
+    try:
+        if fresh:
+            raise queue.Empty
+        return pool.get_nowait(), True
+    except queue.Empty:
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=constants.REQUEST_TIMEOUT), False
+        return http.client.HTTPConnection(netloc, timeout=constants.REQUEST_TIMEOUT), False
+
+
+def release_connection(pool: queue.LifoQueue, conn):
+    """Returns connection to ``pool``, closes it when the pool is full"""
+    try:
+        pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def close_connections():
+    """Closes all idle connections"""
+    with _pools_lock:
+        for pool in _pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+
+
+def get_timings() -> list:
+    """Returns list of ``RequestTiming`` of last ``constants.REQUEST_TIMINGS_KEPT`` requests"""
+    return list(_timings)
+
+
+def clear_timings():
+    _timings.clear()
+
+
+def timings_summary() -> dict:
+    """Sums request timings: time spent on connecting (TCP + TLS handshakes), waiting for server and
+    transferring payload, count of requests and of reused connections"""
+    timings = get_timings()
+    return {'requests': len(timings),
+            'reused': sum(1 for t in timings if t.reused),
+            'connect': sum(t.connect for t in timings),
+            'wait': sum(t.wait for t in timings),
+            'transfer': sum(t.transfer for t in timings),
+            'total': sum(t.total for t in timings),
+            'bytes': sum(t.size for t in timings),
+            'wire_bytes': sum(t.wire_size for t in timings)}
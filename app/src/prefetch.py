@@ -0,0 +1,116 @@
+import threading
+import time
+from datetime import date
+from app.src import api, calendar_store, constants, splits_archive, splits_parser
+
+_state = {'thread': None, 'rounds': 0, 'events': 0, 'classes': 0, 'failed': 0, 'hits': 0, 'misses': 0}
+_done = set()
+_warmed = set()
+_visited = set()
+_lock = threading.Lock()
+
+
+def start() -> bool:
+    """Starts prefetch scheduler in daemon thread (only once per process, unless disabled by
+    ``constants.PREFETCH_ENABLED``)\n
+    :returns True when scheduler is running"""
+    if not constants.PREFETCH_ENABLED:
+        return False
+    with _lock:
+        if _state['thread'] is None:
+            _state['thread'] = threading.Thread(target=run, name='oris-prefetch', daemon=True)
+            _state['thread'].start()
+    return True
+
+
+def run():
+    """Prefetches recent events every ``constants.PREFETCH_INTERVAL`` seconds"""
+    while True:
+        try:
+            prefetch_recent()
+        except Exception:
+            # ORIS outage, next round tries again
+            pass
+        with _lock:
+            _state['rounds'] += 1
+        time.sleep(constants.PREFETCH_INTERVAL)
+
+
+def get_recent_events() -> list:
+    """IDs of (official) events of the last ``constants.RECENT_DAYS``, that already took place
+    (the same window as default calendar view), newest first"""
+    today = date.today()
+    date_from, date_to = calendar_store.get_date_range(False)
+    events = calendar_store.get_calendar(str(today.year), False, date_from, date_to)
+    if type(events) is str or events.empty:
+        return []
+    events = events[events['DateStr'] < today.isoformat()].sort_values('DateStr', ascending=False)
+    return events['ID'].astype(str).to_list()
+
+
+def prefetch_recent():
+    """Loads event metadata and splits of all classes of recent events, which were not prefetched yet,
+    at most ``constants.PREFETCH_RATE`` loads per second\n
+    Event is done, when splits of some class were loaded (other events are tried again in next round)"""
+    for event_id in get_recent_events():
+        if event_id in _done:
+            continue
+        event = api.get_event(event_id)
+        throttle()
+        if type(event) is str:
+            continue
+        loaded = 0
+        for class_id in event.categories:
+            if 'class:' + class_id in _warmed:
+                loaded += 1
+                continue
+            if prefetch_splits(class_id):
+                loaded += 1
+            throttle()
+        with _lock:
+            if loaded > 0:
+                _done.add(event_id)
+                _warmed.add('event:' + event_id)
+                _state['events'] += 1
+
+
+def prefetch_splits(class_id: str) -> bool:
+    """Loads splits of class into persistent cache and then into memory (``splits_parser.load_splits``),
+    error of not yet published splits is not memoized (unless persistent cache is disabled)\n
+    :returns True when splits were loaded"""
+    if splits_archive.contains(class_id):
+        return True
+    if constants.CACHE_PATH:
+        splits = splits_parser.download_splits(class_id)
+    else:
+        splits = splits_parser.load_splits(class_id)
+    with _lock:
+        if type(splits) is str:
+            _state['failed'] += 1
+            return False
+    splits_parser.load_splits(class_id)
+    with _lock:
+        _warmed.add('class:' + class_id)
+        _state['classes'] += 1
+    return True
+
+
+def throttle():
+    time.sleep(1 / constants.PREFETCH_RATE)
+
+
+def record_visit(key: str):
+    """Counts first visit of event or class ``key`` ('event:ID' or 'class:ID') as hit, when it was prefetched,
+    or as miss"""
+    with _lock:
+        if key in _visited:
+            return
+        _visited.add(key)
+        _state['hits' if key in _warmed else 'misses'] += 1
+
+
+def get_stats() -> dict:
+    """Counts of prefetch rounds, prefetched events and classes, classes without splits
+    and first visits served from prefetched data (hits) or not (misses)"""
+    with _lock:
+        return {k: v for k, v in _state.items() if k != 'thread'}
@@ -0,0 +1,95 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import pandas
+from app.src import constants, oris_cache, runner_parser, timings
+
+SEASON_COLUMNS = ['DateStr', 'Date', 'Name', 'Discipline', 'Level', 'Class', 'Place']
+
+_write_lock = threading.Lock()
+
+
+def get_final_until(year: str) -> str:
+    """Last date of season ``year``, whose results do not change any more (see ``constants.CACHE_FINISHED_DAYS``)"""
+    final = (date.today() - timedelta(days=constants.CACHE_FINISHED_DAYS)).isoformat()
+    return min(final, year + '-12-31')
+
+
+def get_stored_season(reg_no: str, year: str):
+    """Looks up stored results of season\n
+    :returns tuple (info, DataFrame of rows, date until which rows are final) or None"""
+    con = oris_cache.get_connection()
+    if con is None:
+        return None
+    row = con.execute('SELECT info, rows, final_until FROM runner_seasons WHERE key = ?',
+                      (reg_no + ':' + year,)).fetchone()
+    if row is None:
+        return None
+    info, rows, final_until = row
+    return json.loads(info), pandas.DataFrame(json.loads(rows), columns=SEASON_COLUMNS), final_until
+
+
+def store_season(reg_no: str, year: str, info: list, rows: pandas.DataFrame, final_until: str):
+    """Stores results of season (also entries without result, so that they are not loaded again)"""
+    con = oris_cache.get_connection()
+    if con is None:
+        return
+    data = json.dumps(rows[SEASON_COLUMNS].to_dict('records'), ensure_ascii=False)
+    with _write_lock:
+        con.execute('INSERT OR REPLACE INTO runner_seasons VALUES (?, ?, ?, ?)',
+                    (reg_no + ':' + year, json.dumps(info, ensure_ascii=False), data, final_until))
+
+
+@timings.timed('load_season')
+def load_season(reg_no: str, year: str, max_workers: int = constants.MAX_PARALLEL_REQUESTS):
+    """Loads results of runner ``reg_no`` in season ``year``, finished seasons are stored permanently,
+    in current season only results of entries newer than stored final results are loaded\n
+    :returns tuple (info, DataFrame with ``SEASON_COLUMNS``, empty for season without entries) or error string
+    (nothing is stored on error)"""
+    final_until = get_final_until(year)
+    stored = get_stored_season(reg_no, year)
+    if stored is not None and stored[2] >= final_until:
+        return stored[0], stored[1]
+    prepared = runner_parser.prepare_entries(reg_no, year)
+    if type(prepared) is str:
+        if prepared != 'error':
+            return prepared
+        # ORIS answered, runner has no entries in season
+        rows = pandas.DataFrame(columns=SEASON_COLUMNS)
+        store_season(reg_no, year, [], rows, final_until)
+        return [], rows
+    entries, events, info, user_id = prepared
+    known = pandas.DataFrame(columns=SEASON_COLUMNS)
+    if stored is not None:
+        known = stored[1][stored[1]['DateStr'] <= stored[2]]
+        entries = entries[entries['DateStr'] > stored[2]]
+    loaded = runner_parser.load_entry_results(entries, events, user_id, max_workers)
+    rows = pandas.concat([known, loaded[SEASON_COLUMNS]], ignore_index=True) if not loaded.empty else known
+    store_season(reg_no, year, info, rows, final_until)
+    return info, rows
+
+
+@timings.timed('load_history')
+def load_history(reg_no: str, years: list = constants.YEARS):
+    """Loads results of runner ``reg_no`` in all ``years``, ``constants.HISTORY_PARALLEL_SEASONS`` seasons are loaded
+    at once (see ``load_season``)\n
+    :returns DataFrame with Season column and ``runner_parser.format_standings`` columns/error string
+    and ``runner_info`` list"""
+    reg_no = reg_no.upper()
+    workers = max(1, min(constants.HISTORY_PARALLEL_SEASONS, len(years)))
+    requests = max(1, constants.MAX_PARALLEL_REQUESTS // workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        seasons = list(pool.map(lambda y: load_season(reg_no, y, requests), years))
+    for season in seasons:
+        if type(season) is str:
+            return season, []
+    tables = [rows.assign(Season=year) for year, (info, rows) in zip(years, seasons) if not rows.empty]
+    infos = [info for info, rows in seasons if info]
+    if not tables:
+        return 'error', []
+    runner_info = infos[0][:2] + ['Sezóny: __' + min(years) + ' - ' + max(years) + '__']
+    rows = pandas.concat(tables, ignore_index=True)
+    data = runner_parser.format_standings(rows)
+    data.insert(0, 'Season', rows.loc[data.index, 'Season'])
+    return data.reset_index(drop=True), runner_info
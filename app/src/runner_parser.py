@@ -1,122 +1,237 @@
-import json
-import urllib.request
-import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 import pandas
 import pandas as pd
-import streamlit as st
-from app.src import constants, splits_parser, loader
+from app.src import calendar_store, constants, oris_cache, timings
 
 
+@timings.timed('load_results')
 def load_results(reg_no: str, year: str):
     """Loads table of (supported) events, where runner with ``reg_no`` competed in ``year``\n
     For each event, some details and standing is loaded\n
     :returns DataFrame/error string and ``runner_info`` list"""
+    prepared = prepare_entries(reg_no, year)
+    if type(prepared) is str:
+        return prepared, []
+    entries, events, runner_info, user_id = prepared
+    result = get_all_standings(entries, events, user_id)
+    return result, runner_info
+
+
+def prepare_entries(reg_no: str, year: str):
+    """Loads entries of runner with ``reg_no`` in ``year`` joined with event details, sorted by date\n
+    :returns tuple (entries, events, runner_info, user_id) or error string"""
     entries, runner_info, user_id = load_event_entries(reg_no, year)
     if type(entries) is str:
-        return entries, []
+        return entries
 
     df = pd.DataFrame.from_dict(entries, orient='index')
-    tmp, events = loader.load_event_calendar(year, '', [], False, True, True, False)
+    events = calendar_store.get_events(year, '', [], False, True, True, False)
     df = df[['EventID', 'ClassID', 'ClassDesc']]
     df['idx'] = df['EventID']
     df.set_index('idx', inplace=True)
     events = events.set_index('ID')
     result = pd.concat([df, events], axis=1, join="inner")
-    result = get_all_standings(result, events, user_id)
-    return result, runner_info
+    result = result.rename(columns={'ClassDesc': 'Class'}).sort_values(by=['DateStr', 'Name'])
+    return result, events, runner_info, user_id
 
 
 #@st.cache
+@timings.timed('load_event_entries')
 def load_event_entries(reg_no: str, year: str):
     """Calls request for data of (supported) events, where runner with ``reg_no`` competed in ``year``\n
-    :returns string with json/error message, runner info and user_id as string"""
-    with urllib.request.urlopen(constants.URL_USER_ID + reg_no) as url:
-        data = json.loads(url.read().decode())
-        if data['Status'] != 'OK' or not data['Data']:
-            return 'registrační číslo ' + reg_no.upper(), [], ''
-        runner_info = ["Jméno: __" + data['Data']['FirstName'] + " " + data['Data']['LastName'] + "__",
-                       "Registrační číslo: __" + reg_no.upper() + "__", "Sezóna: __" + year + "__"]
-        user_id = data['Data']['ID']
+    :returns string with json/error message ('error' when runner has no entries, ``constants.ENTRIES_UNAVAILABLE``
+    when ORIS did not answer), runner info and user_id as string"""
+    data = oris_cache.load_json({'format': 'json', 'method': 'getUser', 'rgnum': reg_no})
+    if data['Status'] != 'OK' or not data['Data']:
+        return 'registrační číslo ' + reg_no.upper(), [], ''
+    runner_info = ["Jméno: __" + data['Data']['FirstName'] + " " + data['Data']['LastName'] + "__",
+                   "Registrační číslo: __" + reg_no.upper() + "__", "Sezóna: __" + year + "__"]
+    user_id = data['Data']['ID']
 
     values = {'format': 'json',
               'method': 'getUserEventEntries',
               'userid': user_id,
               'datefrom': year + '-01-01',
               'dateto': year + '-12-31'}
-    data = urllib.parse.urlencode(values)
-    data = data.encode('utf-8')
-    request = urllib.request.Request(constants.URL, data)
-
-    with urllib.request.urlopen(request) as url:
-        data = json.loads(url.read().decode())
-        if data['Status'] != 'OK' or not data['Data']:
-            return 'error', [], ''
-        entries = data['Data']
+    data = oris_cache.load_json(values)
+    if data['Status'] != 'OK':
+        return constants.ENTRIES_UNAVAILABLE, [], ''
+    if not data['Data']:
+        return 'error', [], ''
+    entries = data['Data']
     return entries, runner_info, user_id
 
 
 #@st.cache
-def get_all_standings(entries: pandas.DataFrame, events: pandas.DataFrame, user_id: str):
+@timings.timed('get_all_standings')
+def get_all_standings(entries: pandas.DataFrame, events: pandas.DataFrame, user_id: str,
+                      max_workers: int = constants.MAX_PARALLEL_REQUESTS):
     """Fills ``entries`` DataFrame with results of all events\n
+    Results are loaded concurrently, at most ``max_workers`` requests at once\n
     For two-day championships, only final day is loaded\n
     :returns filled and formatted DataFrame"""
-    entries['Place'] = entries.apply(lambda row: get_place(row['EventID'], row['ClassID'], user_id), axis=1)
-    entries.rename(columns={'ClassDesc': 'Class'}, inplace=True)
-    entries = get_two_day_champ_data(entries, events, user_id)
-    entries = entries[entries['Place'] != '']
-    entries.sort_values(by=['DateStr', 'Name'], inplace=True)
-    entries = entries[['Date', 'Name', 'Discipline', 'Level', 'Class', 'Place']]
-    return entries
+    return format_standings(load_entry_results(entries, events, user_id, max_workers))
+
+
+def load_entry_results(entries: pandas.DataFrame, events: pandas.DataFrame, user_id: str,
+                       max_workers: int = constants.MAX_PARALLEL_REQUESTS) -> pandas.DataFrame:
+    """Loads results of all ``entries`` concurrently (see ``get_entry_result``)\n
+    :returns entries with Place column (empty for events without runner's result), not formatted"""
+    entries = entries.rename(columns={'ClassDesc': 'Class'})
+    finals = get_finals_index(events)
+    rows = [row for _, row in entries.iterrows()]
+    rows = run_concurrently(lambda row: get_entry_result(row, finals, user_id), [rows], max_workers)
+    return pd.DataFrame(rows) if rows else entries.assign(Place='')
+
+
+def get_entry_result(row, finals: dict, user_id: str):
+    """Loads place of one entry ``row``, for two-day championships the final is looked up (see ``finals``)"""
+    row['Place'] = get_place(row['EventID'], row['ClassID'], user_id)
+    if row['Place'] == '' and row['Level'] == 'MČR':
+        row = get_finals_results(row, finals, user_id)
+        row.name = row['EventID']
+    return row
 
 
-def get_two_day_champ_data(entries: pandas.DataFrame, events: pandas.DataFrame, user_id: str) -> pandas.DataFrame:
-    """Loads results of two-day championships (only final, not qualification)"""
-    champs_entries = entries[entries['Level'] == 'MČR']
-    champs_entries = champs_entries[champs_entries['Place'] == '']
+def format_standings(entries: pandas.DataFrame) -> pandas.DataFrame:
+    """Keeps entries with place, sorted by date, and only displayed columns"""
     entries = entries[entries['Place'] != '']
-    champs_entries = champs_entries.apply(lambda row: get_finals_results(row, events, user_id), axis=1)
-    champs_entries['idx'] = champs_entries['EventID']
-    champs_entries.set_index('idx', inplace=True)
-    result = pd.concat([entries, champs_entries])
-    return result
-
-
-def get_finals_results(row, events: pandas.DataFrame, user_id: str):
-    """For qualification event finds appropriate final event and result"""
-    final = events.loc[((events['Discipline'] == row['Discipline']) & (events['Name'].str.contains("finále")))]
-    if not final.empty:
-        event_id = final.index.to_list()[0]
-        row['EventID'] = event_id
-        row['Name'] = final.loc[event_id, 'Name']
-        row['Date'] = final.loc[event_id, 'Date']
+    entries = entries.sort_values(by=['DateStr', 'Name'])
+    return entries[['Date', 'Name', 'Discipline', 'Level', 'Class', 'Place']]
+
+
+def run_concurrently(func, args: list, max_workers: int) -> list:
+    """Calls ``func`` for every item of ``args`` columns in a thread pool of ``max_workers``\n
+    :returns list of results in the same order as ``args``"""
+    if not args or not args[0]:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(args[0])))) as pool:
+        return list(pool.map(func, *args))
+
+
+def get_finals_index(events: pandas.DataFrame) -> dict:
+    """Indexes final events of championships (with 'finále' in name) by discipline, first final is kept\n
+    :returns dictionary discipline -> (EventID, Name, Date)"""
+    finals = events[events['Name'].str.contains("finále")]
+    finals = finals[~finals['Discipline'].duplicated()]
+    return {d: (i, n, date) for i, d, n, date in zip(finals.index, finals['Discipline'], finals['Name'],
+                                                     finals['Date'])}
+
+
+def get_finals_event(row, finals: dict) -> str:
+    """ID of final event of qualification ``row`` (the qualification itself, when there is no final)"""
+    if row['Discipline'] in finals:
+        return finals[row['Discipline']][0]
+    return row['EventID']
+
+
+def get_finals_results(row, finals: dict, user_id: str, standings: dict = None):
+    """For qualification event finds appropriate final event in ``finals`` index (see ``get_finals_index``)
+    and runner's result in it (or in the qualification event, when there is no final)\n
+    Already loaded standings of events may be passed in ``standings`` dictionary"""
+    event_id = get_finals_event(row, finals)
+    if row['Discipline'] in finals:
+        row['EventID'], row['Name'], row['Date'] = finals[row['Discipline']]
+    if standings is None or event_id not in standings:
+        event_standings = load_event_standings(event_id)
     else:
-        event_id = row['EventID']
-    ctg, tmp1, tmp2 = splits_parser.load_categories(event_id)
-    ctg = ctg[ctg['Name'].str.contains(row['Class'])].reset_index(level=0)
-    classes = ctg['ID'].to_list()
-    for i in range(0, len(classes)):
-        place = get_place(event_id, classes[i], user_id)
-        if place != '':
-            row['Place'] = place
-            row['Class'] = ctg.loc[i, 'Name']
-            break
+        event_standings = standings[event_id]
+    place, class_name = event_standings.get(user_id, ('', ''))
+    if place != '':
+        row['Place'] = place
+        row['Class'] = class_name
     return row
 
 
 def get_place(event_id: str, class_id: str, user_id: str) -> str:
-    """Gets place for ``user`` on ``event`` in ``class``
+    """Gets place for ``user`` on ``event`` in ``class``\n
     returns empty string (when not present), or DISK when disqualified or standing"""
-    with urllib.request.urlopen(constants.URL_RESULTS + event_id + '&classid=' + class_id) as url:
-        data = json.loads(url.read().decode())
-        if data['Status'] != 'OK' or not data['Data']:
-            return ''
-        val_list = list(data['Data'].values())
-        r = [x for x in val_list if x['UserID'] == user_id]
-        if r:
-            r = r[0]
-            if r['Place'] == '':
-                if r['Time'] == 'DISK':
-                    return 'DISK'
-                return ''
-            return r['Place']
-        return ''
+    return load_event_results(event_id, class_id).get(user_id, '')
+
+
+@timings.timed('load_event_standings')
+def load_event_standings(event_id: str) -> dict:
+    """Sends one get request method getEventResults for all classes of ``event``\n
+    :returns dictionary UserID -> (place or DISK, class name), runners without place are left out"""
+    values = {'format': 'json',
+              'method': 'getEventResults',
+              'eventid': event_id}
+    data = oris_cache.load_json(values)
+    if data['Status'] != 'OK' or not data['Data']:
+        return {}
+    standings = {}
+    for x in data['Data'].values():
+        if x['UserID'] in standings:
+            continue
+        standings[x['UserID']] = get_result_place(x), x['ClassDesc']
+    return standings
+
+
+def get_result_place(result: dict) -> str:
+    """Place of one result row, DISK when disqualified or empty string"""
+    if result['Place'] == '':
+        return 'DISK' if result['Time'] == 'DISK' else ''
+    return result['Place']
+
+
+@timings.timed('load_event_results')
+def load_event_results(event_id: str, class_id: str) -> dict:
+    """Sends get request method getEventResults for ``event`` and ``class``\n
+    :returns dictionary UserID -> place (or DISK), runners without place are left out"""
+    values = {'format': 'json',
+              'method': 'getEventResults',
+              'eventid': event_id,
+              'classid': class_id}
+    data = oris_cache.load_json(values)
+    if data['Status'] != 'OK' or not data['Data']:
+        return {}
+    places = {}
+    for x in data['Data'].values():
+        if x['UserID'] in places:
+            continue
+        places[x['UserID']] = get_result_place(x)
+    return places
+
+
+def load_club_results(reg_nos: list, year: str, max_workers: int = constants.MAX_PARALLEL_REQUESTS):
+    """Loads results of all runners with ``reg_nos`` in ``year`` into one table\n
+    Every (event, class) result list is downloaded only once and shared by all runners, who competed in it\n
+    :returns DataFrame/error string"""
+    loaded = run_concurrently(lambda r: load_event_entries(r, year), [reg_nos], max_workers)
+    events = calendar_store.get_events(year, '', [], False, True, True, False)
+    if type(events) is str:
+        return events
+    events = events.set_index('ID')
+
+    frames = []
+    for reg_no, (entries, runner_info, user_id) in zip(reg_nos, loaded):
+        if type(entries) is str:
+            continue
+        df = pd.DataFrame.from_dict(entries, orient='index')[['EventID', 'ClassID', 'ClassDesc']]
+        df['RegNo'] = reg_no.upper()
+        df['UserID'] = user_id
+        frames.append(df)
+    if not frames:
+        return 'error'
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df['EventID'].isin(events.index)]
+    df = df.join(events, on='EventID')
+
+    pairs = df[['EventID', 'ClassID']].drop_duplicates()
+    keys = list(zip(pairs['EventID'], pairs['ClassID']))
+    results = dict(zip(keys, run_concurrently(load_event_results, [pairs['EventID'].to_list(),
+                                                                   pairs['ClassID'].to_list()], max_workers)))
+    df['Place'] = [results[(e, c)].get(u, '') for e, c, u in zip(df['EventID'], df['ClassID'], df['UserID'])]
+    df.rename(columns={'ClassDesc': 'Class'}, inplace=True)
+
+    champs = (df['Level'] == 'MČR') & (df['Place'] == '')
+    finals = get_finals_index(events)
+    rows = [row for _, row in df[champs].iterrows()]
+    final_ids = list(dict.fromkeys(get_finals_event(row, finals) for row in rows))
+    standings = dict(zip(final_ids, run_concurrently(load_event_standings, [final_ids], max_workers)))
+    rows = [get_finals_results(row, finals, row['UserID'], standings) for row in rows]
+    if rows:
+        df = pd.concat([df[~champs], pd.DataFrame(rows)])
+    df = df[df['Place'] != '']
+    df = df.sort_values(by=['DateStr', 'Name', 'RegNo'])
+    return df[['RegNo', 'Date', 'Name', 'Discipline', 'Level', 'Class', 'Place']].reset_index(drop=True)
@@ -0,0 +1,64 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas
+from app.src import constants, runner_parser
+
+_jobs = {}
+_lock = threading.Lock()
+
+
+def start(reg_no: str, year: str, max_workers: int = constants.MAX_PARALLEL_REQUESTS) -> dict:
+    """Starts loading of results of runner with ``reg_no`` in ``year`` in background, unless it is running already
+    or finished less than ``constants.RUNNER_JOB_TTL`` seconds ago (jobs are shared by the whole process,
+    so reloaded page continues with already loaded results)\n
+    :returns job dictionary: runner ``info``, ``total`` count of events, loaded ``rows`` (in date order),
+    ``error`` string and ``finished`` flag"""
+    key = (reg_no.upper(), year)
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and job['error'] == '' and (not job['finished']
+                                                       or time.time() - job['started'] < constants.RUNNER_JOB_TTL):
+            return job
+        job = {'info': [], 'total': 0, 'rows': [], 'error': '', 'finished': False, 'started': time.time()}
+        _jobs[key] = job
+        drop_old_jobs()
+    threading.Thread(target=run, args=(job, reg_no, year, max_workers), daemon=True).start()
+    return job
+
+
+def drop_old_jobs():
+    """Forgets the oldest finished jobs over ``constants.RUNNER_JOBS_KEPT``"""
+    finished = sorted((job['started'], key) for key, job in _jobs.items() if job['finished'])
+    for started, key in finished[:max(0, len(_jobs) - constants.RUNNER_JOBS_KEPT)]:
+        del _jobs[key]
+
+
+def run(job: dict, reg_no: str, year: str, max_workers: int):
+    """Loads results of all entries concurrently, results are appended to ``job`` in date order"""
+    try:
+        prepared = runner_parser.prepare_entries(reg_no, year)
+        if type(prepared) is str:
+            job['error'] = prepared
+            return
+        entries, events, job['info'], user_id = prepared
+        finals = runner_parser.get_finals_index(events)
+        rows = [row for _, row in entries.iterrows()]
+        job['total'] = len(rows)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rows)))) as pool:
+            for row in pool.map(lambda r: runner_parser.get_entry_result(r, finals, user_id), rows):
+                with _lock:
+                    job['rows'].append(row)
+    except Exception as e:
+        job['error'] = str(e) or type(e).__name__
+    finally:
+        job['finished'] = True
+
+
+def get_results(job: dict):
+    """Returns table of results loaded so far (see ``runner_parser.format_standings``) and count of processed events"""
+    with _lock:
+        rows = list(job['rows'])
+    if not rows:
+        return pandas.DataFrame(columns=['Date', 'Name', 'Discipline', 'Level', 'Class', 'Place']), 0
+    return runner_parser.format_standings(pandas.DataFrame(rows)), len(rows)
@@ -0,0 +1,161 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from app.src import calendar_store, constants, splits_parser, timings
+
+_index = {}
+_index_path = None
+_scanned = {}
+_lock = threading.Lock()
+
+
+def get_pyarrow():
+    """Imports pyarrow lazily (optional package), returns None when it is not installed and archive is disabled"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def is_enabled() -> bool:
+    return constants.ARCHIVE_PATH != '' and get_pyarrow() is not None
+
+
+def get_file_path(year: str, event_id: str, class_id: str) -> str:
+    """Archive file of one class, one Arrow IPC file per class: *<year>/<event>-<class>.arrow*"""
+    return os.path.join(constants.ARCHIVE_PATH, year, event_id + '-' + class_id + '.arrow')
+
+
+def get_index() -> dict:
+    """Index of archived classes (class ID -> (year, event ID, file path)), built by one scan of archive directory
+    (see ``refresh_index``)"""
+    global _index_path
+    with _lock:
+        if _index_path != constants.ARCHIVE_PATH:
+            _index.clear()
+            _scanned.clear()
+            _index_path = constants.ARCHIVE_PATH
+            scan_index()
+        return _index
+
+
+def refresh_index() -> dict:
+    """Adds classes archived meanwhile (e.g. by *main.py archive* while the app is running) to the index,
+    only directories, whose modification time changed, are scanned again"""
+    get_index()
+    with _lock:
+        scan_index()
+        return _index
+
+
+def scan_index():
+    """Scans season directories of archive changed since the last scan (called with ``_lock``)"""
+    if not os.path.isdir(_index_path):
+        return
+    for year in os.scandir(_index_path):
+        if not year.is_dir() or not is_changed(year.path):
+            continue
+        for f in os.scandir(year.path):
+            if f.name.endswith('.arrow') and '-' in f.name:
+                event_id, class_id = f.name[:-len('.arrow')].split('-', 1)
+                _index[class_id] = (year.name, event_id, f.path)
+
+
+def is_changed(path: str) -> bool:
+    """Decides whether directory ``path`` changed (files were added) since its last scan"""
+    mtime = os.stat(path).st_mtime_ns
+    changed = _scanned.get(path) != mtime
+    _scanned[path] = mtime
+    return changed
+
+
+def contains(class_id: str) -> bool:
+    """Decides whether class is archived, index is refreshed when class is not found"""
+    return is_enabled() and (class_id in get_index() or class_id in refresh_index())
+
+
+def load_table(class_id: str):
+    """Opens archived splits of class ``class_id`` as Arrow table backed by memory map (no data are copied)\n
+    :returns pyarrow Table or None, when class is not archived"""
+    if not contains(class_id):
+        return None
+    pa = get_pyarrow()
+    source = pa.memory_map(get_index()[class_id][2], 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+@timings.timed('archive_load_splits')
+def load_splits(class_id: str):
+    """Loads archived splits table of class ``class_id`` in the layout of ``splits_parser.load_splits``,
+    numeric columns stay in the memory map (read-only, not copied), only text columns are converted\n
+    :returns DataFrame or None, when class is not archived"""
+    table = load_table(class_id)
+    if table is None:
+        return None
+    return table.to_pandas(split_blocks=True)
+
+
+def save_splits(year: str, event_id: str, class_id: str, splits):
+    """Writes parsed splits DataFrame to archive (atomically, through temporary file)"""
+    pa = get_pyarrow()
+    path = get_file_path(year, event_id, class_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(splits, preserve_index=False)
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + '.tmp', path)
+    index = get_index()
+    with _lock:
+        index[class_id] = (year, event_id, path)
+
+
+def iter_season(year: str):
+    """Iterates over all archived classes of season ``year``\n
+    :returns generator of (event ID, class ID, pyarrow Table)"""
+    if not is_enabled():
+        return
+    for class_id, (y, event_id, path) in sorted(get_index().items(), key=lambda x: x[1][1:]):
+        if y == year:
+            yield event_id, class_id, load_table(class_id)
+
+
+def get_finished_events(events, days: int = constants.CACHE_FINISHED_DAYS) -> list:
+    """IDs of calendar ``events`` (DataFrame with ID and DateStr), which finished at least ``days`` ago,
+    results of newer events may still change"""
+    last = (date.today() - timedelta(days=days)).isoformat()
+    return events.loc[events['DateStr'] <= last, 'ID'].to_list()
+
+
+def archive_class(year: str, event_id: str, class_id: str) -> bool:
+    """Downloads splits of one class and writes them to archive, returns whether there were any splits"""
+    splits = splits_parser.download_splits(class_id)
+    if type(splits) is str:
+        return False
+    save_splits(year, event_id, class_id, splits)
+    return True
+
+
+def prefetch_season(year: str, max_workers: int = constants.MAX_PARALLEL_REQUESTS):
+    """Archives splits of all classes of finished events of season ``year``, already archived classes are skipped\n
+    :returns dictionary with counts of events, archived, already archived and empty classes or error string"""
+    if constants.ARCHIVE_PATH == '':
+        return 'archive disabled'
+    if get_pyarrow() is None:
+        return 'pyarrow missing'
+    events = calendar_store.get_season(year, True)
+    if type(events) is str:
+        return events
+    event_ids = get_finished_events(events)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        loaded = list(pool.map(splits_parser.load_categories, event_ids))
+        pairs = [(event_id, class_id) for event_id, (entity, info, categories) in zip(event_ids, loaded)
+                 if type(entity) is not str for class_id in categories]
+        index = get_index()
+        missing = [(e, c) for e, c in pairs if c not in index]
+        archived = list(pool.map(lambda p: archive_class(year, p[0], p[1]), missing))
+    return {'events': len(event_ids), 'archived': sum(archived), 'skipped': len(pairs) - len(missing),
+            'empty': len(archived) - sum(archived)}
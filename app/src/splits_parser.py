@@ -1,52 +1,154 @@
 # -*- coding: utf-8 -*-
+import functools
+import re
+import numpy as np
 import pandas as pd
-from app.src import constants
-import urllib.request
-import urllib.parse
-import json
-import streamlit as st
+from app.src import constants, oris_cache, splits_archive, timings
 
 
-@st.cache
+@functools.lru_cache(maxsize=constants.SPLITS_CACHE_SIZE)
 def load_splits(class_id: str):
-    """Sends get request method getSplits and parses data from json to DataFrame\n
+    """Loads splits of class from season archive (see ``splits_archive``), or from ORIS, when it is not archived\n
+    :returns DataFrame or error string"""
+    if splits_archive.contains(class_id):
+        return splits_archive.load_splits(class_id)
+    return download_splits(class_id)
+
+
+SPLITS_FRONT = ['ResPlace', 'ResName', 'ResClub', 'RegNo', 'ResTime', 'ResLoss']
+SPLITS_DROPPED = ['StartTime', 'FinishTime', 'PersID']
+SPLITS_ROWS = 1024
+
+
+@timings.timed('load_splits')
+def download_splits(class_id: str):
+    """Sends get request method getSplits and decodes json response straight into columns of DataFrame
+    (see ``create_splits_hook``)\n
+    Time columns are parsed to int32 seconds and place columns to int16 (see ``parse_time`` and ``parse_place``)\n
     :returns DataFrame or error string"""
     values = {'format': 'json',
               'method': 'getSplits',
               'classid': class_id}
-    data = urllib.parse.urlencode(values)
-    data = data.encode('utf-8')
-    request = urllib.request.Request(constants.URL, data)
-    with urllib.request.urlopen(request) as url:
-        data = json.loads(url.read().decode())
-        if data['Status'] != 'OK' or not data['Data']:
-            return 'ID kategorie ' + class_id
-        splits = data['Data']['Splits']
-
-    df = pd.DataFrame.from_dict(splits, orient='index')
-    df.reset_index(level=0, inplace=True)
-    df = df.drop(['index', 'StartTime', 'FinishTime', 'PersID'], axis=1)
+    hook, columns, rows = create_splits_hook()
+    data = oris_cache.load_json(values, hook)
+    if data['Status'] != 'OK' or not data['Data'] or rows[0] == 0:
+        return 'ID kategorie ' + class_id
+    count = rows[0]
+    front = {x: columns[x][0][:count] for x in SPLITS_FRONT}
+    rest = {x: column[:count] for x, (column, parse) in columns.items() if not re.search('Res|Reg', x)}
+    return pd.DataFrame({**front, **rest})
+
+
+def create_splits_hook():
+    """Creates json object hook, which moves fields of every runner (object with RegNo) into per-column arrays
+    instead of keeping the object, times and places are parsed on the way, ``SPLITS_DROPPED`` fields are discarded\n
+    :returns hook, dictionary of columns (name -> (array, parse function)) and one item list with count of rows"""
+    columns = {}
+    rows = [0]
+
+    def hook(obj: dict):
+        if 'RegNo' not in obj:
+            return obj
+        i = rows[0]
+        rows[0] += 1
+        for key, value in obj.items():
+            column = columns.get(key)
+            if column is None:
+                if key in SPLITS_DROPPED:
+                    continue
+                column = columns[key] = create_column(key, i + SPLITS_ROWS)
+            elif i >= len(column[0]):
+                column = columns[key] = grow_column(key, column)
+            array, parse = column
+            array[i] = value if parse is None else parse(value)
+        return None
+    return hook, columns, rows
+
+
+def create_column(name: str, size: int) -> tuple:
+    """Preallocates column for values of ``name`` field: int32 times, int16 places or text (missing values
+    are constants.TIME_MISSING, constants.PLACE_NONE and NaN)\n
+    :returns tuple (array, parse function or None for text)"""
+    if re.search("(Total|Split)Time", name):
+        return np.full(size, constants.TIME_MISSING, dtype=np.int32), parse_time
+    if re.search("(Total|Split)Place", name):
+        return np.full(size, constants.PLACE_NONE, dtype=np.int16), parse_place
+    return np.full(size, np.nan, dtype=object), None
+
 
-    f1 = df.filter(regex="Res.*|Reg.*")
-    f1 = f1[['ResPlace', 'ResName', 'ResClub', 'RegNo', 'ResTime', 'ResLoss']]
-    f2 = df.drop(df.filter(regex="Res.*|Reg.*").columns, axis=1)
-    result = pd.concat([f1, f2], axis=1)
+def grow_column(name: str, column: tuple) -> tuple:
+    """Doubles size of column array, new rows have missing value"""
+    array, parse = column
+    grown = create_column(name, 2 * len(array))
+    grown[0][:len(array)] = array
+    return grown
 
-    return result
 
+def parse_time(text) -> int:
+    """Parses 'M:SS' or 'H:MM:SS' string to int seconds\n
+    DISK, DNS and missing/invalid values are replaced with constants.TIME_* sentinels"""
+    text = '' if text is None else str(text).strip()
+    parts = text.split(':')
+    if 2 <= len(parts) <= 3 and all(p.isdecimal() for p in parts):
+        seconds = 0
+        for p in parts:
+            seconds = seconds * 60 + int(p)
+        return seconds
+    if text == 'DISK':
+        return constants.TIME_DISK
+    if text == 'DNS':
+        return constants.TIME_DNS
+    return constants.TIME_MISSING
 
-@st.cache
+
+def parse_place(text) -> int:
+    """Parses place string to int, missing and '999' places are constants.PLACE_NONE"""
+    text = '' if text is None else str(text).rstrip('.')
+    try:
+        place = int(text)
+    except ValueError:
+        try:
+            place = int(float(text))
+        except (ValueError, OverflowError):
+            return constants.PLACE_NONE
+    if place == 999 or place < 0:
+        return constants.PLACE_NONE
+    return place
+
+
+def format_times(seconds: np.ndarray) -> np.ndarray:
+    """Formats int seconds to 'M:SS' strings, sentinels to DISK, DNS or empty string"""
+    seconds = np.asarray(seconds)
+    minutes, rest = np.divmod(np.maximum(seconds, 0), 60)
+    text = np.char.add(np.char.add(minutes.astype(str), ':'), np.char.zfill(rest.astype(str), 2)).astype(object)
+    text[seconds == constants.TIME_MISSING] = ''
+    text[seconds == constants.TIME_DISK] = 'DISK'
+    text[seconds == constants.TIME_DNS] = 'DNS'
+    return text
+
+
+def format_places(places: np.ndarray) -> np.ndarray:
+    """Formats int places to strings, constants.PLACE_NONE to '---'"""
+    places = np.asarray(places)
+    text = places.astype(str).astype(object)
+    text[places == constants.PLACE_NONE] = '---'
+    return text
+
+
+@functools.lru_cache(maxsize=constants.SPLITS_CACHE_SIZE)
+@timings.timed('load_categories')
 def load_categories(event_id: str):
     """Sends get request method getEvent and parses data from json to DataFrame\n
-    Saves event_info in global variables sapp.event_info and sapp.event_categories\n
-    :returns DataFrame or error string"""
-    with urllib.request.urlopen(constants.URL_CATEGORIES + event_id) as url:
-        data = json.loads(url.read().decode())
-        if data['Status'] != 'OK':
-            return 'ID závodu ' + event_id, [], {}
-        if not data['Data']['Discipline']['ID'] in constants.SUPPORTED_DISCIPLINES_ID:
-            return 'unsupported discipline: ' + data['Data']['Discipline']['NameCZ'], [], {}
-        classes = data['Data']['Classes']
+    :returns DataFrame/error string, event_info list and dictionary of event_categories (ID -> name)"""
+    values = {'format': 'json',
+              'method': 'getEvent',
+              'id': event_id}
+    data = oris_cache.load_json(values)
+    if data['Status'] != 'OK':
+        return 'ID závodu ' + event_id, [], {}
+    if not data['Data']['Discipline']['ID'] in constants.SUPPORTED_DISCIPLINES_ID:
+        return 'unsupported discipline: ' + data['Data']['Discipline']['NameCZ'], [], {}
+    classes = data['Data']['Classes']
 
     event_info = []
     cols = ['Name', 'Date', 'Place', 'Map']
@@ -73,19 +175,19 @@ def reformat_date(x: str) -> str:
     return p[2] + '.' + p[1] + '.' + p[0]
 
 
+EVENT_COLUMNS = ['ID', 'Date', 'Name', 'Org', 'Region', 'Sport', 'DateStr', 'Discipline', 'Level', 'SportID', 'LevelID']
+
+
+@timings.timed('load_events')
 def load_events(values: dict):
     """Sends get request method getEventList and parses data from json to DataFrame\n
     Request is encoded in utf-8, because ``values`` may contain Czech alphabet symbols\n
-    Drops cancelled events\n
+    Drops cancelled events, keeps IDs of sport and level for local filtering\n
     :returns DataFrame or error string"""
-    data = urllib.parse.urlencode(values)
-    data = data.encode('utf-8')
-    request = urllib.request.Request(constants.URL, data)
-    with urllib.request.urlopen(request) as url:
-        data = json.loads(url.read().decode())
-        if data['Status'] != 'OK':
-            return 'event listing error'
-        events = data['Data']
+    data = oris_cache.load_json(values)
+    if data['Status'] != 'OK':
+        return 'event listing error'
+    events = data['Data']
 
     df = pd.DataFrame.from_dict(events, orient='index')
     if df.empty:
@@ -95,10 +197,12 @@ def load_events(values: dict):
         return 'not found'
     df['Discipline'] = df['Discipline'].apply(lambda x: x['ShortName'])
     df = df[df.Discipline.isin(constants.SUPPORTED_DISCIPLINES)]
+    df['LevelID'] = df['Level'].apply(lambda x: x['ID'])
     df['Level'] = df['Level'].apply(lambda x: x['ShortName'])
+    df['SportID'] = df['Sport'].apply(lambda x: x['ID'])
     df['Sport'] = df['Sport'].apply(lambda x: x['NameCZ'])
     df['DateStr'] = df['Date']
     df['Date'] = df['Date'].apply(lambda x: reformat_date(x))
     df['Org'] = df['Org1'].apply(lambda x: x['Abbr'])
     df.reset_index(level=0, inplace=True)
-    return df[['ID', 'Date', 'Name', 'Org', 'Region', 'Sport', 'DateStr', 'Discipline', 'Level']]
+    return df[EVENT_COLUMNS]
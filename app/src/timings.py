@@ -0,0 +1,122 @@
+import contextlib
+import functools
+import threading
+import time
+from collections import deque, namedtuple
+from app.src import constants, oris_client
+
+Span = namedtuple('Span', ['name', 'start', 'duration', 'bytes', 'cache', 'rows'])
+
+_spans = deque(maxlen=constants.TIMING_SPANS_KEPT)
+_totals = {}
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Measures duration of the block as span ``name``, block may fill ``bytes``, ``cache`` ('hit' or 'miss')
+    and ``rows`` of the yielded record"""
+    record = {'bytes': 0, 'cache': '', 'rows': 0}
+    start = time.time()
+    counter = time.perf_counter()
+    try:
+        yield record
+    finally:
+        add_span(Span(name, start, time.perf_counter() - counter, record['bytes'], record['cache'], record['rows']))
+
+
+def get_rows(result) -> int:
+    """Row count of function result: DataFrame or Styler rows, Figure traces, first item of tuple"""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, 'to_plotly_json'):
+        return len(result.data)
+    if type(result).__name__ == 'Styler':
+        result = result.data
+    if hasattr(result, 'shape') and len(result.shape) > 0:
+        return result.shape[0]
+    return 0
+
+
+def timed(name: str):
+    """Decorator measuring every call of function as span ``name`` with row count of its result"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as record:
+                result = func(*args, **kwargs)
+                record['rows'] = get_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def add_span(s: Span):
+    """Keeps span (last ``constants.TIMING_SPANS_KEPT``) and adds it to cumulative totals"""
+    with _lock:
+        _spans.append(s)
+        total = _totals.setdefault(s.name, {'count': 0, 'seconds': 0.0, 'bytes': 0, 'rows': 0, 'hit': 0, 'miss': 0})
+        total['count'] += 1
+        total['seconds'] += s.duration
+        total['bytes'] += s.bytes
+        total['rows'] += s.rows
+        if s.cache != '':
+            total[s.cache] += 1
+
+
+def get_spans(since: float = 0.0) -> list:
+    """Returns kept spans started at ``since`` (time.time()) or later"""
+    with _lock:
+        return [s for s in _spans if s.start >= since]
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+        _totals.clear()
+
+
+def summary(spans: list) -> list:
+    """Groups ``spans`` by name: count, total and max seconds, bytes, cache hits and misses, rows\n
+    :returns list of dictionaries sorted by total time"""
+    groups = {}
+    for s in spans:
+        g = groups.setdefault(s.name, {'name': s.name, 'count': 0, 'seconds': 0.0, 'max': 0.0, 'bytes': 0,
+                                       'hit': 0, 'miss': 0, 'rows': 0})
+        g['count'] += 1
+        g['seconds'] += s.duration
+        g['max'] = max(g['max'], s.duration)
+        g['bytes'] += s.bytes
+        g['rows'] += s.rows
+        if s.cache != '':
+            g[s.cache] += 1
+    return sorted(groups.values(), key=lambda g: -g['seconds'])
+
+
+def to_prometheus() -> str:
+    """Exports cumulative totals of all spans and ORIS client request phases in Prometheus text format"""
+    with _lock:
+        totals = {k: dict(v) for k, v in _totals.items()}
+    lines = []
+    metrics = [('seconds', 'oris_analyser_stage_seconds_total', 'Time spent in stage'),
+               ('count', 'oris_analyser_stage_calls_total', 'Calls of stage'),
+               ('bytes', 'oris_analyser_stage_bytes_total', 'Bytes of ORIS responses processed in stage'),
+               ('rows', 'oris_analyser_stage_rows_total', 'Rows produced by stage')]
+    for key, metric, text in metrics:
+        lines += ['# HELP ' + metric + ' ' + text, '# TYPE ' + metric + ' counter']
+        lines += ['%s{stage="%s"} %s' % (metric, name, repr(total[key])) for name, total in sorted(totals.items())]
+    metric = 'oris_analyser_cache_requests_total'
+    lines += ['# HELP ' + metric + ' ORIS responses served from cache (hit) or downloaded (miss)',
+              '# TYPE ' + metric + ' counter']
+    for name, total in sorted(totals.items()):
+        if total['hit'] or total['miss']:
+            lines += ['%s{stage="%s",result="hit"} %d' % (metric, name, total['hit']),
+                      '%s{stage="%s",result="miss"} %d' % (metric, name, total['miss'])]
+    client = oris_client.timings_summary()
+    metric = 'oris_analyser_client_seconds'
+    lines += ['# HELP ' + metric + ' Time of last ORIS requests by phase', '# TYPE ' + metric + ' gauge']
+    lines += ['%s{phase="%s"} %s' % (metric, phase, repr(client[phase])) for phase in ('connect', 'wait', 'transfer')]
+    for key, metric in (('requests', 'oris_analyser_client_requests'), ('reused', 'oris_analyser_client_reused'),
+                        ('wire_bytes', 'oris_analyser_client_wire_bytes')):
+        lines += ['# TYPE ' + metric + ' gauge', '%s %d' % (metric, client[key])]
+    return '\n'.join(lines) + '\n'
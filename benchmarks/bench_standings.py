@@ -0,0 +1,44 @@
+"""Benchmark of runner analysis standings loading against local fake ORIS server\n
+Run from repository root: *python -m benchmarks.bench_standings*"""
+import argparse
+import time
+
+import pandas as pd
+
+from app.src import calendar_store, oris_client, runner_parser
+from benchmarks.fake_oris import FakeOris, make_season
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sequential vs. concurrent get_all_standings')
+    parser.add_argument('--events', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.2, help='artificial latency of one request in seconds')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with FakeOris(make_season('2021', args.events), args.latency) as oris:
+        reference = None
+        for workers in args.workers:
+            entries, runner_info, user_id = runner_parser.load_event_entries('ABC1234', '2021')
+            events = calendar_store.get_events('2021', '', [], False, True, True, False)
+            df = pd.DataFrame.from_dict(entries, orient='index')[['EventID', 'ClassID', 'ClassDesc']]
+            df['idx'] = df['EventID']
+            df.set_index('idx', inplace=True)
+            events = events.set_index('ID')
+            table = pd.concat([df, events], axis=1, join='inner')
+
+            start = time.perf_counter()
+            result = runner_parser.get_all_standings(table, events, user_id, workers)
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference = result
+            same = reference.equals(result)
+            print('workers=%2d  events=%d  %.2f s  same order: %s' % (workers, len(result), elapsed, same))
+        print('requests served: %d, connections opened: %d' % (oris.requests, oris.connections))
+        summary = oris_client.timings_summary()
+        print('client: %(requests)d requests, %(reused)d on reused connection, connect %(connect).3f s, '
+              'wait %(wait).3f s, transfer %(transfer).3f s, %(wire_bytes)d of %(bytes)d bytes on wire' % summary)
+
+
+if __name__ == '__main__':
+    main()
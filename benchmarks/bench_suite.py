@@ -0,0 +1,165 @@
+"""End-to-end benchmark of splits and runner analysis stages against local fake ORIS server\n
+Run from repository root: *python -m benchmarks.bench_suite [-o results.json] [--compare old.json]*\n
+Every stage is repeated and its minimum and median time is saved to JSON, so that runs of different
+commits can be compared. Synthetic inputs can be recorded to (and replayed from) ``--fixtures`` directory"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import plotly.graph_objects as go
+
+from app.gui import graph_renderer, pdf_creator
+from app.src import calendar_store, constants, graphs, loader, runner_history, runner_parser, splits_parser
+from benchmarks.fake_oris import FakeOris, load_fixtures, make_career, make_event, make_season, save_fixtures
+
+
+def get_data(name: str, fixtures: str, create) -> dict:
+    """Returns payloads of data set ``name``, from ``fixtures`` directory when recorded there
+    (otherwise created by ``create`` and recorded)"""
+    if fixtures == '':
+        return create()
+    path = os.path.join(fixtures, name)
+    if os.path.isdir(path):
+        return load_fixtures(path)
+    data = create()
+    save_fixtures(data, path)
+    return data
+
+
+def measure(func, repeat: int, prepare=None) -> dict:
+    """Calls ``func`` ``repeat`` times (after ``prepare``, which is not measured), first warm-up call is not measured\n
+    :returns dictionary with min and median time in seconds"""
+    times = []
+    for _ in range(repeat + 1):
+        if prepare is not None:
+            prepare()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times = times[1:]
+    return {'min': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+
+def clear_caches():
+    splits_parser.load_splits.cache_clear()
+    splits_parser.load_categories.cache_clear()
+    calendar_store.clear()
+
+
+def bench_splits(runners: int, args) -> dict:
+    """Times splits analysis stages of one class with ``runners``"""
+    event_id = str(7000 + runners)
+    class_id = event_id + '00'
+    data = get_data('splits_%d' % runners, args.fixtures,
+                    lambda: make_event(event_id, 1, runners, args.controls))
+    results = {}
+    with FakeOris(data, args.latency):
+        results['load_splits'] = measure(lambda: splits_parser.load_splits(class_id), args.repeat, clear_caches)
+        splits = splits_parser.load_splits(class_id)
+        results['prepare_data'] = measure(lambda: graphs.get_plotly_splits_prepare_data(splits, 'none', []),
+                                          args.repeat)
+        results['figure_absolute'] = measure(lambda: loader.load_split_graphs(splits, False, 'none', []),
+                                             args.repeat)
+        results['figure_relative'] = measure(lambda: loader.load_split_graphs(splits, True, 'none', []),
+                                             args.repeat)
+        graph = loader.create_split_graph(splits, False)
+        results['graph_update'] = measure(lambda: [loader.update_split_graph(graph, splits, limit, [])
+                                                   for limit in ('5', '10')], args.repeat)
+        filtered = splits['RegNo'].iloc[:3].to_list()
+        results['crop_and_style'] = measure(lambda: [loader.crop_and_style(splits, 'none', filtered, mode).to_html()
+                                                     for mode in (False, True)], args.repeat)
+        # memoized views of class (built by warm-up call), only slicing and styling is measured
+        results['style_view'] = measure(lambda: [loader.crop_and_style(splits, 'none', filtered, mode,
+                                                                       class_id).to_html()
+                                                 for mode in (False, True)], args.repeat)
+        if not args.skip_pdf:
+            results['pdf_with_graph'] = measure(lambda: pdf_creator.pdf_with_graph(
+                splits, 'none', 'Kategorie: H21', [], '', []).output(dest='S'), args.pdf_repeat)
+    return results
+
+
+def bench_season(events: int, args) -> dict:
+    """Times full runner analysis of season with ``events``"""
+    data = get_data('season_%d' % events, args.fixtures, lambda: make_season('2021', events))
+    with FakeOris(data, args.latency) as oris:
+        result = measure(lambda: runner_parser.load_results('ABC1234', '2021'), args.repeat, clear_caches)
+        result['requests'] = oris.requests // (args.repeat + 1)
+    return {'load_results': result}
+
+
+def bench_history(events: int, args) -> dict:
+    """Times repeated view of runner history over all ``constants.YEARS`` with ``events`` in every season
+    (finished seasons are stored in temporary cache database by the first, warm-up call)"""
+    years = constants.YEARS
+    data = get_data('career_%d' % events, args.fixtures, lambda: make_career(years, events))
+    with tempfile.TemporaryDirectory() as directory:
+        with FakeOris(data, args.latency, os.path.join(directory, 'oris.sqlite')) as oris:
+            result = measure(lambda: runner_history.load_history('ABC1234', years), args.repeat, calendar_store.clear)
+            result['requests'] = oris.requests
+    return {'load_history': result}
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(results: dict, path: str):
+    """Prints median time ratios of current ``results`` to results saved in ``path``"""
+    with open(path, encoding='utf-8') as f:
+        old = json.load(f)['results']
+    for case, stages in results.items():
+        for stage, value in stages.items():
+            if case in old and stage in old[case]:
+                ratio = value['median'] / old[case][stage]['median'] if old[case][stage]['median'] else 0
+                print('%-14s %-16s %8.4f s -> %8.4f s  x%.2f' % (case, stage, old[case][stage]['median'],
+                                                                 value['median'], ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Timings of splits and runner analysis stages')
+    parser.add_argument('--runners', type=int, nargs='+', default=[10, 100, 1000], help='class sizes')
+    parser.add_argument('--controls', type=int, default=20)
+    parser.add_argument('--events', type=int, nargs='+', default=[10, 30, 100], help='season sizes')
+    parser.add_argument('--history-events', type=int, nargs='*', default=[30], help='events of history seasons')
+    parser.add_argument('--latency', type=float, default=0.0, help='artificial latency of one request in seconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pdf-repeat', type=int, default=2)
+    parser.add_argument('--skip-pdf', action='store_true')
+    parser.add_argument('--fixtures', default='', help='directory of recorded inputs')
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    parser.add_argument('--compare', default='', help='results of previous run')
+    args = parser.parse_args()
+
+    if not args.skip_pdf:
+        graph_renderer.start()
+        graph_renderer.render_png(go.Figure())
+    results = {}
+    for runners in args.runners:
+        results['splits_%d' % runners] = bench_splits(runners, args)
+    for events in args.events:
+        results['season_%d' % events] = bench_season(events, args)
+    for events in args.history_events:
+        results['history_%d' % events] = bench_history(events, args)
+    for case, stages in results.items():
+        for stage, value in stages.items():
+            print('%-14s %-16s min %8.4f s  median %8.4f s' % (case, stage, value['min'], value['median']))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'commit': get_commit(), 'date': datetime.now().isoformat(timespec='seconds'),
+                   'python': platform.python_version(), 'latency': args.latency, 'results': results}, f, indent=1)
+    if args.compare != '':
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
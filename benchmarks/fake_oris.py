@@ -0,0 +1,230 @@
+"""Local stand-in for the ORIS API used by benchmarks\n
+Serves synthetic JSON responses with configurable artificial latency, ORIS response cache and splits
+archive are redirected to ``cache_path`` and ``archive_path`` (disabled by default), so that every call reaches the server"""
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.src import constants, oris_client
+
+DISCIPLINES = [('SP', 'Sprint'), ('KT', 'Krátká trať'), ('KL', 'Klasická trať')]
+LEVELS = ['MČR', 'ČP', 'ŽB', 'OŽ', 'OM']
+
+
+def make_season(year: str, events_cnt: int, user_id: str = '1000', first_id: int = 0) -> dict:
+    """Creates synthetic season of ``events_cnt`` events, where user ``user_id`` competed in all of them
+    (event IDs start at 5000 + ``first_id``)\n
+    :returns dictionary of ORIS ``Data`` payloads keyed by method name"""
+    events = {}
+    entries = {}
+    results = {}
+    for i in range(events_cnt):
+        event_id = str(5000 + first_id + i)
+        class_id = str(90000 + first_id + i)
+        short, name = DISCIPLINES[i % len(DISCIPLINES)]
+        month = 1 + (i * 12) // max(events_cnt, 1)
+        events['Event_' + event_id] = {
+            'ID': event_id, 'Name': 'Závod ' + str(i + 1), 'Date': '%s-%02d-%02d' % (year, month, 1 + i % 28),
+            'Org1': {'Abbr': 'ABC'}, 'Region': 'P', 'Sport': {'ID': '1', 'NameCZ': 'OB'},
+            'Discipline': {'ShortName': short, 'NameCZ': name},
+            'Level': {'ID': str(1 + i % len(LEVELS)), 'ShortName': LEVELS[i % len(LEVELS)]},
+            'Cancelled': '0'}
+        entries['Entry_' + event_id] = {'EventID': event_id, 'ClassID': class_id, 'ClassDesc': 'H21'}
+        results[class_id] = {'Result_' + str(r): {'UserID': str(int(user_id) + r), 'Place': str(r + 1) + '.',
+                                                  'Time': '50:00', 'ClassDesc': 'H21'} for r in range(30)}
+        results['event:' + event_id] = results[class_id]
+    return {'getEventList': events, 'getUserEventEntries': entries, 'getEventResults': results,
+            'getUser': {'ID': user_id, 'FirstName': 'Test', 'LastName': 'Runner'}}
+
+
+def make_career(years: list, events_cnt: int, user_id: str = '1000') -> dict:
+    """Creates synthetic seasons ``years`` (see ``make_season``) of one runner in one data set"""
+    data = {}
+    for i, year in enumerate(years):
+        season = make_season(year, events_cnt, user_id, i * events_cnt)
+        for method, payload in season.items():
+            if method == 'getUser':
+                data[method] = payload
+            else:
+                data.setdefault(method, {}).update(payload)
+    return data
+
+
+def format_time(seconds: int) -> str:
+    return '%d:%02d' % divmod(seconds, 60)
+
+
+def make_splits(runners: int, controls: int, seed: int = 0) -> dict:
+    """Creates synthetic getSplits ``Data`` payload of class with ``runners`` and ``controls`` (plus finish)\n
+    Every tenth runner is disqualified and the last one did not start"""
+    rng = random.Random(seed)
+    legs = [rng.randint(60, 400) for _ in range(controls + 1)]
+    table = []
+    for r in range(runners):
+        pace = 1 + r * 0.01
+        splits = [int(x * pace * rng.uniform(0.9, 1.3)) for x in legs]
+        table.append(splits)
+    status = ['OK' if r % 10 != 9 else 'DISK' for r in range(runners)]
+    if runners > 1:
+        status[-1] = 'DNS'
+    order = sorted(range(runners), key=lambda r: (status[r] != 'OK', sum(table[r])))
+    totals = {r: [sum(table[r][:c + 1]) for c in range(controls + 1)] for r in range(runners)}
+    keys = [str(c + 1) for c in range(controls)] + ['999']
+
+    def place(c: int, r: int, values) -> str:
+        if status[r] != 'OK':
+            return '999'
+        return str(1 + sum(1 for o in range(runners) if status[o] == 'OK' and values(o)[c] < values(r)[c]))
+
+    result = {}
+    winner = sum(table[order[0]])
+    for i, r in enumerate(order):
+        runner = {'ResPlace': str(i + 1) + '.' if status[r] == 'OK' else '', 'ResName': 'Runner %d' % r,
+                  'ResClub': 'Club %d' % (r % 7), 'RegNo': 'ABC%04d' % r, 'PersID': str(r),
+                  'ResTime': format_time(sum(table[r])) if status[r] == 'OK' else status[r],
+                  'ResLoss': '+' + format_time(sum(table[r]) - winner) if status[r] == 'OK' else '',
+                  'StartTime': '10:%02d' % (r % 60), 'FinishTime': ''}
+        for c, key in enumerate(keys):
+            ok = status[r] == 'OK' or (status[r] == 'DISK' and c < controls // 2)
+            finish = key == '999' and status[r] != 'OK'
+            runner['TotalTime' + key] = status[r] if finish else format_time(totals[r][c]) if ok else ''
+            runner['TotalPlace' + key] = place(c, r, lambda o: totals[o])
+            runner['SplitTime' + key] = status[r] if finish else format_time(table[r][c]) if ok else ''
+            runner['SplitPlace' + key] = place(c, r, lambda o: table[o])
+        result['Split_' + str(i)] = runner
+    return {'Splits': result}
+
+
+def make_event(event_id: str, classes: int, runners: int, controls: int, date: str = '2021-05-01') -> dict:
+    """Creates synthetic event with ``classes`` categories, each of ``runners`` with ``controls``\n
+    :returns dictionary of getEvent and getSplits ``Data`` payloads"""
+    event = {'ID': event_id, 'Name': 'Závod ' + event_id, 'Date': date, 'Place': 'Praha', 'Map': 'Mapa',
+             'Discipline': {'ID': '2', 'NameCZ': 'Krátká trať'}, 'Classes': {}}
+    splits = {}
+    for c in range(classes):
+        class_id = str(int(event_id) * 100 + c)
+        name = ('H' if c % 2 == 0 else 'D') + str(10 + 2 * (c // 2))
+        event['Classes']['Class_' + class_id] = {'ID': class_id, 'Name': name, 'Distance': '4.20',
+                                                 'Climbing': '120', 'Controls': str(controls)}
+        splits[class_id] = make_splits(runners, controls, c)
+    return {'getEvent': event, 'getSplits': splits}
+
+
+def save_fixtures(data: dict, path: str):
+    """Records ``data`` payloads to directory ``path``, one JSON file per ORIS method"""
+    os.makedirs(path, exist_ok=True)
+    for method, payload in data.items():
+        with open(os.path.join(path, method + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+
+def load_fixtures(path: str) -> dict:
+    """Loads payloads recorded by ``save_fixtures``\n
+    :returns dictionary of ORIS ``Data`` payloads keyed by method name"""
+    data = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith('.json'):
+            with open(os.path.join(path, name), encoding='utf-8') as f:
+                data[name[:-len('.json')]] = json.load(f)
+    return data
+
+
+class FakeOris:
+    """ORIS stand-in running in a background thread, use as context manager\n
+    Every request waits ``latency`` seconds before the response is sent"""
+
+    def __init__(self, data: dict, latency: float = 0.0, cache_path: str = '', archive_path: str = ''):
+        self.data = data
+        self.latency = latency
+        self.cache_path = cache_path
+        self.archive_path = archive_path
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.saved = {}
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:%d/API/?' % self.server.server_address[1]
+
+    def respond(self, params: dict) -> dict:
+        """Builds ORIS response for request ``params``"""
+        method = params.get('method', '')
+        payload = self.data.get(method)
+        if method == 'getEventResults':
+            key = params.get('classid', '') or 'event:' + params.get('eventid', '')
+            payload = payload.get(key, {}) if payload else None
+        elif method == 'getSplits':
+            payload = payload.get(params.get('classid', '')) if payload else None
+        elif method == 'getEventList' and payload:
+            payload = {k: v for k, v in payload.items()
+                       if params.get('datefrom', '') <= v['Date'] <= params.get('dateto', '9999')}
+        elif method == 'getUserEventEntries' and payload:
+            dates = {v['ID']: v['Date'] for v in self.data.get('getEventList', {}).values()}
+            payload = {k: v for k, v in payload.items()
+                       if params.get('datefrom', '') <= dates.get(v['EventID'], '') <= params.get('dateto', '9999')}
+        if payload is None:
+            return {'Status': 'Error', 'Data': None}
+        return {'Status': 'OK', 'Data': payload}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _reply(self, query: str):
+                with fake.lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                params = dict(urllib.parse.parse_qsl(query))
+                body = json.dumps(fake.respond(params)).encode()
+                self.send_response(200)
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(urllib.parse.urlsplit(self.path).query)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                self._reply(self.rfile.read(length).decode())
+
+            def setup(self):
+                super().setup()
+                with fake.lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        for name, value in (('URL', self.url), ('CACHE_PATH', self.cache_path),
+                            ('ARCHIVE_PATH', self.archive_path)):
+            self.saved[name] = getattr(constants, name)
+            setattr(constants, name, value)
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self.saved.items():
+            setattr(constants, name, value)
+        oris_client.close_connections()
+        self.server.shutdown()
+        self.server.server_close()
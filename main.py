@@ -1,12 +1,14 @@
-from app.gui import streamlitapp as sapp
 import sys
-import streamlit
 
 
 # inspired by StackOverflow
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        from app.gui import cli
+        sys.exit(cli.main(sys.argv[1:]))
     #if streamlit._is_running_with_streamlit:
-        sapp.main()
+    from app.gui import streamlitapp as sapp
+    sapp.main()
     #else:
         #sys.argv = ["streamlit", "run", sys.argv[0]]
         # sys.exit(sapp.main())